@@ -8,7 +8,7 @@
 import os
 
 from pygw.logger import Logger
-from pygw.configuration import cast_strdict_as_dtypedict
+from pygw.configuration import load_task_config
 from pygfs.task.atm_analysis import AtmAnalysis
 
 # Initialize root logger
@@ -18,7 +18,7 @@ logger = Logger(level='DEBUG', colored_log=True)
 if __name__ == '__main__':
 
     # Take configuration from environment and cast it as python dictionary
-    config = cast_strdict_as_dtypedict(os.environ)
+    config = load_task_config(os.environ)
 
     # Instantiate the atm analysis task
     AtmAnl = AtmAnalysis(config)
@@ -6,7 +6,7 @@
 import os
 
 from pygw.logger import Logger
-from pygw.configuration import cast_strdict_as_dtypedict
+from pygw.configuration import load_task_config
 from pygfs.task.atmens_analysis import AtmEnsAnalysis
 
 # Initialize root logger
@@ -16,7 +16,7 @@ logger = Logger(level='DEBUG', colored_log=True)
 if __name__ == '__main__':
 
     # Take configuration from environment and cast it as python dictionary
-    config = cast_strdict_as_dtypedict(os.environ)
+    config = load_task_config(os.environ)
 
     # Instantiate the atmens analysis task
     AtmEnsAnl = AtmEnsAnalysis(config)
@@ -4,7 +4,7 @@ import os
 
 from pygw.logger import Logger, logit
 from pygw.yaml_file import save_as_yaml
-from pygw.configuration import cast_strdict_as_dtypedict
+from pygw.configuration import load_task_config
 from pygfs.task.gfs_forecast import GFSForecast
 
 # initialize root logger
@@ -15,7 +15,7 @@ logger = Logger(level=os.environ.get("LOGGING_LEVEL"), colored_log=True)
 def main():
 
     # instantiate the forecast
-    config = cast_strdict_as_dtypedict(os.environ)
+    config = load_task_config(os.environ)
     save_as_yaml(config, f'{config.EXPDIR}/fcst.yaml')  # Temporarily save the input to the Forecast
 
     fcst = GFSForecast(config)
@@ -382,6 +382,20 @@ cd "${script_dir}" || exit 8
         ${LINK} "gfs_utils.fd/src/${prog}" .
     done
 
+#------------------------------
+#--compile the Jinja templates of parm (and of the GDASApp parm) into the bundle
+#--loaded by pygw (see PYGW_JINJA_BUNDLE in config.base); the templates are
+#--rendered from their source when the bundle is missing or out of date
+#------------------------------
+cd "${top_dir}/parm" || exit 1
+if command -v python3 &> /dev/null; then
+  PYTHONPATH="${top_dir}/ush/python/pygw/src${PYTHONPATH:+:${PYTHONPATH}}" \
+    python3 "${top_dir}/ush/compile_jinja_templates.py" "${top_dir}/parm/jinja_templates.zip" || \
+    echo "WARNING: unable to compile the Jinja templates, they will be rendered from their source"
+else
+  echo "WARNING: python3 not found, the Jinja templates are not compiled"
+fi
+
 #------------------------------
 #  copy $HOMEgfs/parm/config/config.base.nco.static as config.base for operations
 #  config.base in the $HOMEgfs/parm/config has no use in development
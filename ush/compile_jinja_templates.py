@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import os
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+from pygw.jinja import Jinja
+
+
+def _default_template_dirs():
+    """
+    Default Jinja template directories of the global-workflow
+    (parm and, when checked out, the GDASApp parm)
+    """
+    homegfs = os.environ.get('HOMEgfs', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    template_dirs = [os.path.join(homegfs, 'parm'),
+                     os.path.join(homegfs, 'sorc', 'gdas.cd', 'parm')]
+    return [template_dir for template_dir in template_dirs if os.path.isdir(template_dir)]
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(
+        description=("Compile the Jinja templates under the given directories ahead-of-time into a bundle "
+                     "that pygw.jinja.Jinja loads via bundle=... or ${PYGW_JINJA_BUNDLE}"),
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('target', type=str, help="Bundle to write (zip file or directory with --no-zip)")
+    parser.add_argument('-d', '--template-dir', dest='template_dirs', action='append', required=False,
+                        help="Template directory to compile (repeatable); defaults to ${HOMEgfs}/parm")
+    parser.add_argument('-e', '--extension', dest='extensions', action='append', required=False,
+                        help="Template file extension to compile (repeatable)")
+    parser.add_argument('--no-zip', help="write a directory of modules instead of a zip file",
+                        action='store_true', required=False)
+    args = parser.parse_args()
+
+    template_dirs = args.template_dirs or _default_template_dirs()
+    Jinja.compile_bundle(template_dirs, args.target, extensions=args.extensions,
+                         zip=None if args.no_zip else 'deflated')
+    print(f"compiled templates from {', '.join(template_dirs)} into {args.target}")
@@ -5,14 +5,19 @@ from logging import getLogger
 from netCDF4 import Dataset
 from typing import List, Dict, Any
 
-from pygw.yaml_file import YAMLFile, parse_j2yaml, parse_yamltmpl
+from pygw.yaml_file import YAMLFile, parse_j2yaml, parse_yamltmpl, J2YAMLCache
 from pygw.file_utils import FileHandler
 from pygw.template import Template, TemplateConstants
 from pygw.logger import logit
 from pygw.task import Task
+from pygw.tracing import span
+from pygw import metrics
 
 logger = getLogger(__name__.split('.')[-1])
 
+_RENDER_CACHE_HITS = metrics.counter('pygfs_render_cache_hits_total', 'Renderings of Analysis.render_j2yaml reused')
+_RENDER_CACHE_MISSES = metrics.counter('pygfs_render_cache_misses_total', 'Renderings of Analysis.render_j2yaml')
+
 
 class Analysis(Task):
     """Parent class for GDAS tasks
@@ -25,6 +30,8 @@ class Analysis(Task):
     def __init__(self, config: Dict[str, Any]) -> None:
         super().__init__(config)
         self.config.ntiles = 6
+        # Rendered templates, see render_j2yaml
+        self._render_cache = J2YAMLCache()
 
     def initialize(self) -> None:
         super().initialize()
@@ -56,7 +63,7 @@ class Analysis(Task):
             a dictionary containing the list of observation files to copy for FileHandler
         """
         logger.debug(f"OBS_LIST: {self.task_config['OBS_LIST']}")
-        obs_list_config = parse_j2yaml(self.task_config["OBS_LIST"], self.task_config)
+        obs_list_config = self.render_j2yaml(self.task_config["OBS_LIST"])
         logger.debug(f"obs_list_config: {obs_list_config}")
         # get observers from master dictionary
         observers = obs_list_config['observers']
@@ -88,7 +95,7 @@ class Analysis(Task):
             a dictionary containing the list of observation bias files to copy for FileHandler
         """
         logger.debug(f"OBS_LIST: {self.task_config['OBS_LIST']}")
-        obs_list_config = parse_j2yaml(self.task_config["OBS_LIST"], self.task_config)
+        obs_list_config = self.render_j2yaml(self.task_config["OBS_LIST"])
         logger.debug(f"obs_list_config: {obs_list_config}")
         # get observers from master dictionary
         observers = obs_list_config['observers']
@@ -109,6 +116,41 @@ class Analysis(Task):
         }
         return bias_dict
 
+    @logit(logger)
+    def render_j2yaml(self, path: str, data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Render a jinja2-templated yaml file with parse_j2yaml, memoized
+
+        The rendered templates are cached per task (see J2YAMLCache): a cached rendering is reused
+        as long as the template and the files it depends on are unchanged on disk, and the values of
+        the variables they reference (in data and, for !ENV and !INC, in the environment) are the same
+
+        Parameters
+        ----------
+        path : str
+            the path to the yaml file
+        data : Dict, optional
+            the context for templating, defaults to task_config
+
+        Returns
+        ----------
+        yaml_dict: Dict
+            a copy of the rendered yaml, that the caller may modify
+        """
+        data = self.task_config if data is None else data
+
+        yaml_dict = self._render_cache.get(path, data)
+        if yaml_dict is not None:
+            logger.debug(f"Reusing rendered {path}")
+            _RENDER_CACHE_HITS.inc()
+            return yaml_dict
+
+        _RENDER_CACHE_MISSES.inc()
+        includes = []
+        with span('render_j2yaml', path=path):
+            yaml_dict = parse_j2yaml(path, data, includes=includes)
+        self._render_cache.put(path, data, yaml_dict, includes)
+        return yaml_dict
+
     @logit(logger)
     def add_fv3_increments(self, inc_file_tmpl: str, bkg_file_tmpl: str, incvars: List) -> None:
         """Add cubed-sphere increments to cubed-sphere backgrounds
@@ -7,11 +7,11 @@ import tarfile
 from logging import getLogger
 from typing import Dict, List, Any
 
-from pygw.attrdict import AttrDict
+from pygw.attrdict import AttrDict, LayeredAttrDict
 from pygw.file_utils import FileHandler
 from pygw.timetools import add_to_datetime, to_fv3time, to_timedelta, to_YMDH
 from pygw.fsutils import rm_p, chdir
-from pygw.yaml_file import parse_yamltmpl, parse_j2yaml, save_as_yaml
+from pygw.yaml_file import parse_yamltmpl, save_as_yaml
 from pygw.logger import logit
 from pygw.executable import Executable
 from pygw.exceptions import WorkflowException
@@ -53,7 +53,7 @@ class AtmAnalysis(Analysis):
         )
 
         # task_config is everything that this task should need
-        self.task_config = AttrDict(**self.config, **self.runtime_config, **local_dict)
+        self.task_config = LayeredAttrDict(local_dict, self.runtime_config, self.config)
 
     @logit(logger)
     def initialize(self: Analysis) -> None:
@@ -88,11 +88,11 @@ class AtmAnalysis(Analysis):
         FileHandler(self.get_berror_dict(self.task_config)).sync()
 
         # stage backgrounds
-        FileHandler(self.get_bkg_dict(AttrDict(self.task_config))).sync()
+        FileHandler(self.get_bkg_dict(LayeredAttrDict(self.task_config))).sync()
 
         # generate variational YAML file
         logger.debug(f"Generate variational YAML file: {self.task_config.fv3jedi_yaml}")
-        varda_yaml = parse_j2yaml(self.task_config.ATMVARYAML, self.task_config)
+        varda_yaml = self.render_j2yaml(self.task_config.ATMVARYAML)
         save_as_yaml(varda_yaml, self.task_config.fv3jedi_yaml)
         logger.info(f"Wrote variational YAML to: {self.task_config.fv3jedi_yaml}")
 
@@ -7,13 +7,13 @@ import tarfile
 from logging import getLogger
 from typing import Dict, List, Any
 
-from pygw.attrdict import AttrDict
+from pygw.attrdict import AttrDict, LayeredAttrDict
 from pygw.file_utils import FileHandler
 from pygw.timetools import add_to_datetime, to_fv3time, to_timedelta, to_YMDH, to_YMD
 from pygw.fsutils import rm_p, chdir
-from pygw.yaml_file import parse_yamltmpl, parse_j2yaml, save_as_yaml
+from pygw.yaml_file import parse_yamltmpl, save_as_yaml
 from pygw.logger import logit
-from pygw.executable import Executable
+from pygw.executable import Executable, ExecutablePool
 from pygw.exceptions import WorkflowException
 from pygw.template import Template, TemplateConstants
 from pygfs.task.analysis import Analysis
@@ -50,7 +50,7 @@ class AtmEnsAnalysis(Analysis):
         )
 
         # task_config is everything that this task should need
-        self.task_config = AttrDict(**self.config, **self.runtime_config, **local_dict)
+        self.task_config = LayeredAttrDict(local_dict, self.runtime_config, self.config)
 
     @logit(logger)
     def initialize(self: Analysis) -> None:
@@ -83,14 +83,14 @@ class AtmEnsAnalysis(Analysis):
             'YMD': to_YMD(self.task_config.current_cycle),
             'HH': self.task_config.current_cycle.strftime('%H')
         }
+        memchars = [f"mem{imem:03d}" for imem in range(1, self.task_config.NMEM_ENS + 1)]
+        # create output directory paths for member analysis
+        incdirs = Template.render_many(template_inc, TemplateConstants.DOLLAR_CURLY_BRACE,
+                                       [dict(tmpl_inc_dict, MEMDIR=memchar) for memchar in memchars])
         dirlist = []
-        for imem in range(1, self.task_config.NMEM_ENS + 1):
-            dirlist.append(os.path.join(self.task_config.DATA, 'bkg', f'mem{imem:03d}'))
-            dirlist.append(os.path.join(self.task_config.DATA, 'anl', f'mem{imem:03d}'))
-
-            # create output directory path for member analysis
-            tmpl_inc_dict['MEMDIR'] = f"mem{imem:03d}"
-            incdir = Template.substitute_structure(template_inc, TemplateConstants.DOLLAR_CURLY_BRACE, tmpl_inc_dict.get)
+        for memchar, incdir in zip(memchars, incdirs):
+            dirlist.append(os.path.join(self.task_config.DATA, 'bkg', memchar))
+            dirlist.append(os.path.join(self.task_config.DATA, 'anl', memchar))
             dirlist.append(incdir)
 
         FileHandler({'mkdir': dirlist}).sync()
@@ -112,7 +112,7 @@ class AtmEnsAnalysis(Analysis):
 
         # generate ensemble da YAML file
         logger.debug(f"Generate ensemble da YAML file: {self.task_config.fv3jedi_yaml}")
-        ensda_yaml = parse_j2yaml(self.task_config.ATMENSYAML, self.task_config)
+        ensda_yaml = self.render_j2yaml(self.task_config.ATMENSYAML)
         save_as_yaml(ensda_yaml, self.task_config.fv3jedi_yaml)
         logger.info(f"Wrote ensemble da YAML to: {self.task_config.fv3jedi_yaml}")
 
@@ -262,30 +262,31 @@ class AtmEnsAnalysis(Analysis):
             'HH': self.task_config.previous_cycle.strftime('%H')
         }
 
-        # loop over ensemble members
-        for imem in range(1, self.task_config.NMEM_ENS + 1):
-            memchar = f"mem{imem:03d}"
+        # create output paths for member analysis increments, and paths of member backgrounds
+        memchars = [f"mem{imem:03d}" for imem in range(1, self.task_config.NMEM_ENS + 1)]
+        incdirs = Template.render_many(template_inc, TemplateConstants.DOLLAR_CURLY_BRACE,
+                                       [dict(tmpl_inc_dict, MEMDIR=memchar) for memchar in memchars])
+        gesdirs = Template.render_many(template_ges, TemplateConstants.DOLLAR_CURLY_BRACE,
+                                       [dict(tmpl_ges_dict, MEMDIR=memchar) for memchar in memchars])
 
-            # create output path for member analysis increment
-            tmpl_inc_dict['MEMDIR'] = memchar
-            incdir = Template.substitute_structure(template_inc, TemplateConstants.DOLLAR_CURLY_BRACE, tmpl_inc_dict.get)
+        # loop over ensemble members, running incpy for all of them concurrently
+        pool = ExecutablePool()
+        for memchar, incdir, gesdir in zip(memchars, incdirs, gesdirs):
 
             # rewrite UFS-DA atmens increments
-            tmpl_ges_dict['MEMDIR'] = memchar
-            gesdir = Template.substitute_structure(template_ges, TemplateConstants.DOLLAR_CURLY_BRACE, tmpl_ges_dict.get)
             atmges_fv3 = os.path.join(gesdir, f"{self.task_config.CDUMP}.t{self.task_config.previous_cycle.hour:02d}z.atmf006.nc")
             atminc_jedi = os.path.join(self.task_config.DATA, 'anl', memchar, f'atminc.{cdate_inc}z.nc4')
             atminc_fv3 = os.path.join(incdir, f"{self.task_config.CDUMP}.t{self.task_config.cyc:02d}z.atminc.nc")
 
-            # Execute incpy to create the UFS model atm increment file
-            # TODO: use MPMD or parallelize with mpi4py
-            # See https://github.com/NOAA-EMC/global-workflow/pull/1373#discussion_r1173060656
+            # Execute incpy to create the UFS model atm increment file (the members run concurrently, see pool.run)
             cmd = Executable(incpy)
             cmd.add_default_arg(atmges_fv3)
             cmd.add_default_arg(atminc_jedi)
             cmd.add_default_arg(atminc_fv3)
             logger.debug(f"Executing {cmd}")
-            cmd(output='stdout', error='stderr')
+            pool.submit(cmd, output=f'stdout.{memchar}', error=f'stderr.{memchar}')
+
+        pool.run()
 
     @logit(logger)
     def get_bkg_dict(self: Analysis) -> Dict[str, List[str]]:
@@ -318,12 +319,13 @@ class AtmEnsAnalysis(Analysis):
             'MEMDIR': None
         }
 
-        for imem in range(1, self.task_config.NMEM_ENS + 1):
-            memchar = f"mem{imem:03d}"
+        memchars = [f"mem{imem:03d}" for imem in range(1, self.task_config.NMEM_ENS + 1)]
+        rst_dirs = Template.render_many(template_res, TemplateConstants.DOLLAR_CURLY_BRACE,
+                                        [dict(tmpl_res_dict, MEMDIR=memchar) for memchar in memchars])
+
+        for memchar, rst_dir in zip(memchars, rst_dirs):
 
             # get FV3 restart files, this will be a lot simpler when using history files
-            tmpl_res_dict['MEMDIR'] = memchar
-            rst_dir = Template.substitute_structure(template_res, TemplateConstants.DOLLAR_CURLY_BRACE, tmpl_res_dict.get)
             rstlist.append(rst_dir)
 
             run_dir = os.path.join(self.task_config.DATA, 'bkg', memchar)
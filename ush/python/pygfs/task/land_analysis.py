@@ -5,11 +5,10 @@ from logging import getLogger
 from typing import Dict, List
 from pprint import pformat
 
-from pygw.attrdict import AttrDict
+from pygw.attrdict import AttrDict, LayeredAttrDict
 from pygw.file_utils import FileHandler
 from pygw.timetools import to_fv3time, to_YMD, to_YMDH
 from pygw.fsutils import rm_p
-from pygw.yaml_file import parse_j2yaml
 from pygw.jinja import Jinja
 from pygw.logger import logit
 from pygw.executable import Executable
@@ -35,7 +34,7 @@ class LandAnalysis(Analysis):
         )
 
         # task_config is everything that this task should need
-        self.task_config = AttrDict(**self.config, **self.runtime_config, **local_dict)
+        self.task_config = LayeredAttrDict(local_dict, self.runtime_config, self.config)
 
     @logit(logger)
     def prepare_IMS(self: Analysis) -> None:
@@ -69,7 +68,7 @@ class LandAnalysis(Analysis):
 
         # Read and render the IMS_OBS_LIST yaml
         logger.info(f"Reading {self.task_config.IMS_OBS_LIST}")
-        prep_ims_config = parse_j2yaml(self.task_config.IMS_OBS_LIST, cfg)
+        prep_ims_config = self.render_j2yaml(self.task_config.IMS_OBS_LIST, cfg)
         logger.debug(f"{self.task_config.IMS_OBS_LIST}:\n{pformat(prep_ims_config)}")
 
         # copy the IMS obs files from COM_OBS to DATA/obs
@@ -1,4 +1,3 @@
-import re
 import copy
 import logging
 from typing import Dict, Any
@@ -42,12 +41,10 @@ class UFS:
 
         with open(input_template, 'r') as fhi:
             file_in = fhi.read()
-            file_out = Template.substitute_structure(
-                file_in, TemplateConstants.AT_SQUARE_BRACES, ctx.get)
+            file_out, matches = Template.substitute_styles(
+                file_in, {TemplateConstants.AT_SQUARE_BRACES: ctx.get})
 
-        # If there are unrendered bits, find out what they are
-        pattern = r"@\[.*?\]+"
-        matches = re.findall(pattern, file_out)
+        # If there are unrendered bits, report what they are
         if matches:
             logger.warn(f"{input_template} was rendered incompletely")
             logger.warn(f"The following variables were not substituted")
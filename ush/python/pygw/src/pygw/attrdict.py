@@ -8,7 +8,7 @@
 
 import copy
 
-__all__ = ['AttrDict']
+__all__ = ['AttrDict', 'FrozenAttrDict', 'LayeredAttrDict']
 
 
 class AttrDict(dict):
@@ -169,3 +169,213 @@ class AttrDict(dict):
 
     def unfreeze(self):
         self.freeze(False)
+
+    def snapshot(self):
+        """
+        Return a read-only, hashable copy of this dictionary (see FrozenAttrDict)
+        """
+        return FrozenAttrDict(self)
+
+
+class FrozenAttrDict(AttrDict):
+    """
+    Read-only, hashable AttrDict.
+    Nested values are frozen recursively: dictionaries into FrozenAttrDict, lists and tuples into tuples
+    and sets into frozensets.
+    Missing keys raise KeyError (AttributeError for attributes) instead of creating new children.
+    The hash is computed from the items on first use and cached, so snapshots can be used as
+    keys of caches (e.g. rendered templates).
+    """
+
+    def __init__(__self, *args, **kwargs):
+        object.__setattr__(__self, '__frozen', True)
+        for key, val in dict(*args, **kwargs).items():
+            dict.__setitem__(__self, key, __self._hook(val))
+
+    @classmethod
+    def _hook(cls, item):
+        if isinstance(item, FrozenAttrDict):
+            return item
+        elif isinstance(item, dict):
+            return cls(item)
+        elif isinstance(item, (list, tuple)):
+            return tuple(cls._hook(elem) for elem in item)
+        elif isinstance(item, (set, frozenset)):
+            return frozenset(cls._hook(elem) for elem in item)
+        return item
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"'{type(self).__name__}' object is read-only")
+
+    __setitem__ = __delitem__ = __setattr__ = __delattr__ = __ior__ = _readonly
+    update = pop = popitem = clear = setdefault = _readonly
+
+    def __getattr__(self, item):
+        try:
+            return dict.__getitem__(self, item)
+        except KeyError:
+            raise AttributeError(item)
+
+    def __missing__(self, name):
+        raise KeyError(name)
+
+    def __hash__(self):
+        try:
+            return self.__dict__['_hash']
+        except KeyError:
+            pass
+        for key, val in self.items():
+            try:
+                hash(val)
+            except TypeError:
+                raise TypeError(f"'{type(self).__name__}' object is not hashable: "
+                                f"the value of {key!r} is an unhashable '{type(val).__name__}'")
+        self.__dict__['_hash'] = hash(frozenset(self.items()))
+        return self.__dict__['_hash']
+
+    def freeze(self, shouldFreeze=True):
+        if not shouldFreeze:
+            self._readonly()
+
+    def snapshot(self):
+        return self
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __reduce_ex__(self, protocol):
+        return self.__reduce__()
+
+
+class LayeredAttrDict(AttrDict):
+    """
+    AttrDict view of a stack of dictionaries, without copying them (like collections.ChainMap),
+    so building it does not depend on the size of the layers.
+    A key is looked up in the dictionary itself (the top layer), then in each of `layers` in turn.
+    Writes and deletions only go to the top layer, the layers are never modified through the view:
+    a nested dictionary or list of a layer is copied (as by AttrDict) into the top layer when it is
+    first read, so that changes made to it through the view stay in the view.
+
+    Methods that need all the keys (iteration, len, items, ==, ...) go through the layers,
+    so do `to_dict`, `**` unpacking, pickling and deepcopy; `copy` keeps the layers.
+    """
+
+    def __init__(__self, *layers, **kwargs):
+        object.__setattr__(__self, '_layers', layers)
+        # keys of the layers deleted from the view
+        object.__setattr__(__self, '_deleted', set())
+        super().__init__(**kwargs)
+
+    def _keys(self):
+        """
+        The keys of the view, in the order of a merge of the layers (the last layer first)
+        """
+        seen = set()
+        for layer in reversed(self._layers):
+            for key in layer:
+                if key not in seen and key not in self._deleted:
+                    seen.add(key)
+                    yield key
+        for key in dict.__iter__(self):
+            if key not in seen:
+                yield key
+
+    def __getitem__(self, key):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        if key not in self._deleted:
+            for layer in self._layers:
+                if key in layer:
+                    value = layer[key]
+                    if isinstance(value, (dict, list, tuple)):
+                        value = AttrDict._hook(value)
+                        dict.__setitem__(self, key, value)
+                    return value
+        return self.__missing__(key)
+
+    def __setitem__(self, key, value):
+        self._deleted.discard(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if dict.__contains__(self, key):
+            dict.__delitem__(self, key)
+        if any(key in layer for layer in self._layers):
+            self._deleted.add(key)
+
+    def __contains__(self, key):
+        if dict.__contains__(self, key):
+            return True
+        return key not in self._deleted and any(key in layer for layer in self._layers)
+
+    def __iter__(self):
+        return self._keys()
+
+    def __len__(self):
+        return sum(1 for _ in self._keys())
+
+    def keys(self):
+        return dict.fromkeys(self._keys()).keys()
+
+    def items(self):
+        return {key: self[key] for key in self._keys()}.items()
+
+    def values(self):
+        return {key: self[key] for key in self._keys()}.values()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *args):
+        if key not in self:
+            if args:
+                return args[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        keys = list(self._keys())
+        if not keys:
+            raise KeyError('popitem(): dictionary is empty')
+        return keys[-1], self.pop(keys[-1])
+
+    def clear(self):
+        dict.clear(self)
+        for layer in self._layers:
+            self._deleted.update(layer)
+
+    def __eq__(self, other):
+        if isinstance(other, LayeredAttrDict):
+            other = dict(other.items())
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def copy(self):
+        other = self.__class__(*self._layers)
+        for key, val in dict.items(self):
+            dict.__setitem__(other, key, AttrDict._hook(val))
+        other._deleted.update(self._deleted)
+        return other
+
+    def to_dict(self):
+        base = AttrDict()
+        dict.update(base, self.items())
+        return base.to_dict()
+
+    def __reduce_ex__(self, protocol):
+        return AttrDict, (dict(self.items()),)
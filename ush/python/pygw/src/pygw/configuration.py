@@ -1,7 +1,13 @@
 import glob
+import hashlib
 import os
+import pickle
 import random
+import re
+import shutil
 import subprocess
+import tempfile
+from functools import lru_cache
 from pathlib import Path
 from pprint import pprint
 from typing import Union, List, Dict, Any
@@ -9,7 +15,9 @@ from typing import Union, List, Dict, Any
 from pygw.attrdict import AttrDict
 from pygw.timetools import to_datetime
 
-__all__ = ['Configuration', 'cast_as_dtype', 'cast_strdict_as_dtypedict']
+__all__ = ['Configuration', 'ConfigCache', 'LazyDtypeDict', 'ShellSubsetEvaluator', 'ShellSubsetError',
+           'cast_as_dtype', 'cast_strdict_as_dtypedict',
+           'write_config_snapshot', 'load_config_snapshot', 'load_task_config']
 
 
 class ShellScriptException(Exception):
@@ -32,15 +40,35 @@ class Configuration:
     (or generally for sourcing a shell script into a python dictionary)
     """
 
-    def __init__(self, config_dir: Union[str, Path]):
+    EVALUATORS = ['bash', 'python', 'verify']
+
+    def __init__(self, config_dir: Union[str, Path], cache_dir: Union[str, Path] = None,
+                 evaluator: str = None):
         """
         Given a directory containing config files (config.XYZ),
         return a list of config_files minus the ones ending with ".default"
+
+        If `cache_dir` (or the environment variable PYGW_CONFIG_CACHE_DIR) is set,
+        the results of `parse_config` are cached on disk in that directory
+        See `ConfigCache` for details
+
+        `evaluator` (or the environment variable PYGW_CONFIG_EVALUATOR) selects how the config files are sourced:
+        'bash' (default) sources them in a shell,
+        'python' evaluates them in-process with `ShellSubsetEvaluator`, falling back to bash
+        for the scripts that use constructs outside of the supported subset,
+        'verify' does both and raises ShellScriptException if the results differ
         """
 
         self.config_dir = config_dir
         self.config_files = self._get_configs
 
+        cache_dir = cache_dir or os.environ.get('PYGW_CONFIG_CACHE_DIR')
+        self.cache = ConfigCache(cache_dir, self.config_files) if cache_dir else None
+
+        self.evaluator = evaluator or os.environ.get('PYGW_CONFIG_EVALUATOR', 'bash')
+        if self.evaluator not in self.EVALUATORS:
+            raise ValueError(f'Unknown config evaluator {self.evaluator}, valid choices are {self.EVALUATORS}')
+
     @property
     def _get_configs(self) -> List[str]:
         """
@@ -66,12 +94,14 @@ class Configuration:
         raise UnknownConfigError(
             f'{config_name} does not exist (known: {repr(config_name)}), ABORT!')
 
-    def parse_config(self, files: Union[str, bytes, list]) -> Dict[str, Any]:
+    def parse_config(self, files: Union[str, bytes, list], cast: bool = True) -> Dict[str, Any]:
         """
         Given the name of config file(s), key-value pair of all variables in the config file(s)
         are returned as a dictionary
         :param files: config file or list of config files
         :type files: list or str or unicode
+        :param cast: cast the values into datatypes (see `cast_as_dtype`), or return them as str
+        :type cast: bool
         :return: Key value pairs representing the environment variables defined
                 in the script.
         :rtype: dict
@@ -79,7 +109,67 @@ class Configuration:
         if isinstance(files, (str, bytes)):
             files = [files]
         files = [self.find_config(file) for file in files]
-        return cast_strdict_as_dtypedict(self._get_script_env(files))
+
+        if not cast:
+            return self._evaluate(files)
+
+        if self.cache is None:
+            return cast_strdict_as_dtypedict(self._evaluate(files))
+
+        key = self.cache.key(files)
+        config = self.cache.get(key)
+        if config is None:
+            config = cast_strdict_as_dtypedict(self._evaluate(files))
+            self.cache.put(key, config)
+        return config
+
+    def parse_configs_batch(self, batch: List[Union[str, bytes, list]],
+                            common: Union[str, bytes, list] = 'config.base',
+                            cast: bool = True) -> List[Dict[str, Any]]:
+        """
+        Parse several sets of config files that all start by sourcing the same `common` config file(s).
+        The `common` files are sourced once in a single shell, and each set in `batch` is then
+        sourced in a subshell forked from it, so a single shell process is spawned for the whole batch.
+        Each returned dictionary is identical to `parse_config(common + files)`
+        :param batch: list of config files or list of config file lists
+        :type batch: list
+        :param common: config file or list of config files sourced before every entry in `batch`
+        :type common: list or str or unicode
+        :param cast: cast the values into datatypes (see `cast_as_dtype`), or return them as str
+        :type cast: bool
+        :return: Key value pairs representing the environment variables defined
+                in the script(s) for each entry in `batch`, in order.
+        :rtype: list
+        """
+        if isinstance(common, (str, bytes)):
+            common = [common]
+        common = [self.find_config(file) for file in common]
+
+        entries = []
+        for files in batch:
+            if isinstance(files, (str, bytes)):
+                files = [files]
+            entries.append([self.find_config(file) for file in files])
+
+        if not cast:
+            return self._evaluate_batch(common, entries)
+
+        keys = [None] * len(entries)
+        configs = [None] * len(entries)
+        if self.cache is not None:
+            for ii, files in enumerate(entries):
+                keys[ii] = self.cache.key(common + files)
+                configs[ii] = self.cache.get(keys[ii])
+
+        missing = [ii for ii, config in enumerate(configs) if config is None]
+        if missing:
+            script_envs = self._evaluate_batch(common, [entries[ii] for ii in missing])
+            for ii, script_env in zip(missing, script_envs):
+                configs[ii] = cast_strdict_as_dtypedict(script_env)
+                if self.cache is not None:
+                    self.cache.put(keys[ii], configs[ii])
+
+        return configs
 
     def print_config(self, files: Union[str, bytes, list]) -> None:
         """
@@ -92,6 +182,72 @@ class Configuration:
         config = self.parse_config(files)
         pprint(config, width=4)
 
+    def _evaluate(self, scripts: List) -> Dict[str, Any]:
+        """
+        Return the variables exported by `scripts` with the selected evaluator
+        """
+        if self.evaluator == 'bash':
+            return self._get_script_env(scripts)
+
+        try:
+            script_env = ShellSubsetEvaluator.get_script_env(scripts)
+        except ShellSubsetError:
+            return self._get_script_env(scripts)
+
+        if self.evaluator == 'verify':
+            self._verify(scripts, script_env, self._get_script_env(scripts))
+        return script_env
+
+    def _evaluate_batch(self, common: List, entries: List[List]) -> List[Dict[str, Any]]:
+        """
+        Return the variables exported by `common` + each entry of `entries` with the selected evaluator
+        If `common` cannot be evaluated in python, the state of the shell after sourcing it is
+        captured from bash (4.4 or later, otherwise everything is sourced in bash)
+        and the entries are evaluated in python from there.
+        """
+        if self.evaluator == 'bash':
+            return self._get_batch_script_env(common, entries)
+
+        try:
+            state = ShellSubsetEvaluator(os.environ)
+            for script in common:
+                state.source(script)
+            default_env = os.environ
+        except ShellSubsetError:
+            if self._bash_version() < (4, 4):
+                return self._get_batch_script_env(common, entries)
+            default_env, state = self._get_shell_state(common)
+
+        script_envs = [None] * len(entries)
+        for ii, scripts in enumerate(entries):
+            evaluator = state.copy()
+            try:
+                for script in scripts:
+                    evaluator.source(script)
+            except ShellSubsetError:
+                continue
+            environment = evaluator.environment
+            script_envs[ii] = {v: environment[v] for v in set(environment) - set(default_env)}
+
+        if self.evaluator == 'verify':
+            for ii, script_env in enumerate(self._get_batch_script_env(common, entries)):
+                if script_envs[ii] is not None:
+                    self._verify(common + entries[ii], script_envs[ii], script_env)
+                script_envs[ii] = script_env
+            return script_envs
+
+        missing = [ii for ii, script_env in enumerate(script_envs) if script_env is None]
+        if missing:
+            for ii, script_env in zip(missing, self._get_batch_script_env(common, [entries[ii] for ii in missing])):
+                script_envs[ii] = script_env
+        return script_envs
+
+    @staticmethod
+    def _verify(scripts: List, python_env: Dict[str, Any], bash_env: Dict[str, Any]) -> None:
+        differ = sorted(v for v in set(python_env) | set(bash_env) if python_env.get(v) != bash_env.get(v))
+        if differ:
+            raise ShellScriptException(scripts, 'python and bash evaluations differ for ' + ', '.join(differ))
+
     @classmethod
     def _get_script_env(cls, scripts: List) -> Dict[str, Any]:
         default_env = cls._get_shell_env([])
@@ -101,17 +257,117 @@ class Configuration:
         union_env.update(and_script_env)
         return dict([(v, union_env[v]) for v in vars_just_in_script])
 
+    @classmethod
+    def _get_batch_script_env(cls, common: List, entries: List[List]) -> List[Dict[str, Any]]:
+        default_env, script_envs = cls._get_batch_shell_env(common, entries)
+        return [{v: script_env[v] for v in set(script_env) - set(default_env)}
+                for script_env in script_envs]
+
+    @staticmethod
+    def _get_batch_shell_env(common: List, entries: List[List]) -> (Dict[str, Any], List[Dict[str, Any]]):
+        """
+        Source `common` once and then each entry of `entries` in a subshell of the same shell.
+        Each subshell writes a NUL-delimited marker followed by its NUL-delimited environment
+        to the shared stdout pipe.  Returns the default environment (before sourcing anything)
+        and the environment of each entry.
+        """
+        magic = f'--- ENVIRONMENT BEGIN {random.randint(0,64**5)} ---'
+        runme = f'printf "%s\\0" "{magic} default" ; /usr/bin/env -0 ; '
+        runme += ''.join([f'source {s} ; ' for s in common])
+        for ii, scripts in enumerate(entries):
+            runme += '( ' + ''.join([f'source {s} ; ' for s in scripts])
+            runme += f'printf "%s\\0" "{magic} {ii}" ; /usr/bin/env -0 ) ; '
+        blocks = Configuration._get_shell_blocks(runme, magic)
+
+        failed = [scripts for ii, scripts in enumerate(entries) if str(ii) not in blocks]
+        if 'default' not in blocks or failed:
+            scripts = common + [s for scripts in failed for s in scripts]
+            raise ShellScriptException(scripts, 'Cannot find magic string; '
+                                       f'{len(failed)} of {len(entries)} script sets failed')
+
+        return blocks['default'], [blocks[str(ii)] for ii in range(len(entries))]
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _bash_version() -> tuple:
+        """
+        (major, minor) version of bash; (0, 0) if it cannot be determined
+        """
+        out = Configuration._run_bash('echo "${BASH_VERSINFO[0]} ${BASH_VERSINFO[1]}"').split()
+        try:
+            return int(out[0]), int(out[1])
+        except (IndexError, ValueError):
+            return 0, 0
+
+    @staticmethod
+    def _get_shell_state(common: List) -> (Dict[str, Any], 'ShellSubsetEvaluator'):
+        """
+        Source `common` in bash and capture its state: all the shell variables,
+        which of them are exported and which are read-only (requires bash 4.4 or later
+        for `${var@a}`, see _bash_version).
+        Returns the default environment (before sourcing anything) and
+        a ShellSubsetEvaluator holding the state after sourcing `common`.
+        """
+        magic = f'--- ENVIRONMENT BEGIN {random.randint(0,64**5)} ---'
+        runme = f'printf "%s\\0" "{magic} default" ; /usr/bin/env -0 ; '
+        runme += ''.join([f'source {s} ; ' for s in common])
+        runme += f'printf "%s\\0" "{magic} exported" ; /usr/bin/env -0 ; '
+        runme += f'printf "%s\\0" "{magic} variables" ; '
+        runme += 'for __pygw_v in $(compgen -v) ; do printf "%s=%s\\0" "$__pygw_v" "${!__pygw_v}" ; done ; '
+        runme += f'printf "%s\\0" "{magic} readonly" ; '
+        runme += 'for __pygw_v in $(compgen -v) ; do printf "%s=%s\\0" "$__pygw_v" "${!__pygw_v@a}" ; done ; '
+        runme += f'printf "%s\\0" "{magic} end"'
+        blocks = Configuration._get_shell_blocks(runme, magic)
+        if 'end' not in blocks:
+            raise ShellScriptException(common, 'Cannot find magic string; '
+                                       'at least one script failed')
+
+        variables = {v: value for v, value in blocks['variables'].items()
+                     if v != '__pygw_v' and v not in ShellSubsetEvaluator._DYNAMIC}
+        readonly = {v for v, attributes in blocks['readonly'].items() if 'r' in attributes}
+        state = ShellSubsetEvaluator(variables, exported=set(blocks['exported']).intersection(variables),
+                                     readonly=readonly)
+        return blocks['default'], state
+
+    @staticmethod
+    def _run_bash(runme: str) -> str:
+        """
+        Run `runme` with bash (the config files are bash scripts, and /bin/sh
+        may be another shell, e.g. dash without `source`) and return its stdout
+        """
+        with open('/dev/null', 'w') as null:
+            env = subprocess.Popen([shutil.which('bash') or '/bin/bash', '-c', runme],
+                                   stdin=null.fileno(), stdout=subprocess.PIPE)
+            (out, err) = env.communicate()
+        return out.decode()
+
+    @staticmethod
+    def _get_shell_blocks(runme: str, magic: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Run `runme` in bash and split its NUL-delimited output into
+        blocks of name=value pairs, each starting with the marker "`magic` <block name>"
+        """
+        out = Configuration._run_bash(runme)
+
+        marker = re.compile(re.escape(magic) + r' (\w+)$')
+        blocks = dict()
+        varbls = None
+        for entry in out.split('\x00'):
+            found = marker.search(entry)
+            if found:
+                varbls = blocks[found.group(1)] = dict()
+            elif varbls is not None and entry:
+                iequal = entry.find('=')
+                varbls[entry[0:iequal]] = entry[iequal + 1:]
+        return blocks
+
     @staticmethod
     def _get_shell_env(scripts: List) -> Dict[str, Any]:
         varbls = dict()
         runme = ''.join([f'source {s} ; ' for s in scripts])
         magic = f'--- ENVIRONMENT BEGIN {random.randint(0,64**5)} ---'
         runme += f'/bin/echo -n "{magic}" ; /usr/bin/env -0'
-        with open('/dev/null', 'w') as null:
-            env = subprocess.Popen(runme, shell=True, stdin=null.fileno(),
-                                   stdout=subprocess.PIPE)
-            (out, err) = env.communicate()
-        out = out.decode()
+        out = Configuration._run_bash(runme)
         begin = out.find(magic)
         if begin < 0:
             raise ShellScriptException(scripts, 'Cannot find magic string; '
@@ -122,7 +378,1146 @@ class Configuration:
         return varbls
 
 
-def cast_strdict_as_dtypedict(ctx: Dict[str, str]) -> Dict[str, Any]:
+class ConfigCache:
+    """
+    On-disk cache of the typed dictionaries returned by `Configuration.parse_config`
+
+    An entry is keyed on:
+    - the content hash of each config file that is sourced,
+      and of every config file it sources in turn (`source` or `.`)
+    - the value of each environment variable whose name appears in those files
+
+    Sourced files are resolved by name in the config directory, since the
+    config files source each other through ${EXPDIR}.  If a sourced file name
+    cannot be resolved statically (e.g. config.${component}), the contents of
+    all the config files in the config directory are hashed instead.
+    """
+
+    _SOURCE_RE = re.compile(r'^\s*(?:source|\.)\s+["\']?([^\s"\';]+)', re.MULTILINE)
+    _NAME_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+    def __init__(self, cache_dir: Union[str, Path], config_files: List[str]):
+        """
+        Parameters
+        ----------
+        cache_dir : str or Path
+                    directory to store the cache entries in
+        config_files : list
+                       full paths of the config files known to the `Configuration`
+        """
+        self.cache_dir = Path(cache_dir)
+        self.config_files = {os.path.basename(config): config for config in config_files}
+
+    def key(self, scripts: List[str]) -> str:
+        """
+        Compute the cache key for sourcing `scripts` in the current environment
+        Parameters
+        ----------
+        scripts : list
+                  full paths of the config files to source (in order)
+        Returns
+        -------
+        key : str
+              hexdigest of the scripts, their dependencies and the relevant environment
+        """
+        digest = hashlib.sha256()
+        names = set()
+        for script, contents in self._get_dependencies(scripts):
+            digest.update(f'{script}\0'.encode())
+            digest.update(hashlib.sha256(contents).digest())
+            names.update(self._NAME_RE.findall(contents.decode(errors='replace')))
+
+        for name in sorted(names.intersection(os.environ)):
+            digest.update(f'{name}={os.environ[name]}\0'.encode())
+
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Union[Dict[str, Any], None]:
+        """
+        Return the cached dictionary for `key` or None if there is no (readable) entry
+        """
+        try:
+            with open(self.cache_dir / f'{key}.pkl', 'rb') as fh:
+                return AttrDict(pickle.load(fh))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key: str, config: Dict[str, Any]) -> None:
+        """
+        Store `config` for `key`.
+        The entry is written to a temporary file first and moved in place,
+        so that concurrent readers never see a partially written entry
+        """
+        _write_pickle(dict(config), self.cache_dir / f'{key}.pkl')
+
+    def _get_dependencies(self, scripts: List[str]) -> List[tuple]:
+        """
+        Return a list of (path, contents) for `scripts` and every config file they source
+        """
+        result = []
+        seen = set()
+        pending = list(scripts)
+        while pending:
+            script = pending.pop(0)
+            if script in seen:
+                continue
+            seen.add(script)
+            try:
+                with open(script, 'rb') as fh:
+                    contents = fh.read()
+            except OSError:
+                contents = b''
+            result.append((script, contents))
+
+            for sourced in self._SOURCE_RE.findall(contents.decode(errors='replace')):
+                basename = os.path.basename(sourced)
+                if basename in self.config_files:
+                    pending.append(self.config_files[basename])
+                elif '$' in basename:
+                    # Cannot tell which file is sourced; depend on all of them
+                    pending.extend(sorted(self.config_files.values()))
+                else:
+                    pending.append(sourced)
+
+        return result
+
+
+def _write_pickle(obj: Any, path: Union[str, Path]) -> None:
+    """
+    Pickle `obj` to a temporary file first and move it in place,
+    so that concurrent readers never see a partially written file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmpfile = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpfile, path)
+    except Exception:
+        os.unlink(tmpfile)
+        raise
+
+
+class ShellSubsetError(Exception):
+    """
+    Raised by ShellSubsetEvaluator when a script uses a shell construct outside of the supported subset
+    """
+    pass
+
+
+class ShellSubsetEvaluator:
+    """
+    In-process evaluator for the subset of bash used by the config.* files
+
+    Supported are:
+    - variable assignments, `export`, `declare`/`typeset` (-r, -x), `readonly` and `unset`
+    - parameter expansions $VAR, ${VAR}, $1..$9, $#, $?, ${#VAR} and
+      ${VAR:-word}, ${VAR-word}, ${VAR:=word}, ${VAR=word}, ${VAR:+word}, ${VAR+word},
+      ${VAR,,}, ${VAR^^}, ${VAR,}, ${VAR^}
+    - single and double quoting, backslash escapes, comments and line continuations
+    - `if`/`elif`/`else`/`fi`, `case`/`esac`, `&&` and `||` lists
+    - `[[ ... ]]`, `[ ... ]` and `test` conditions
+    - `source` and `.` of other files (with positional arguments)
+    - `echo`, `printf`, `:`, `true` and `false` (output is discarded)
+
+    Anything else (command substitution, arithmetic, loops, functions, redirections, pipes,
+    external commands, exit, ...) raises ShellSubsetError when it is reached, and the caller is
+    expected to fall back to sourcing the script(s) with bash.
+    """
+
+    _NAME_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+    _ASSIGNMENT_RE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)=')
+    _PARAMETER_RE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*|[0-9]|[?#])(.*)', re.DOTALL)
+    _INTEGER_RE = re.compile(r'\s*([+-]?)([0-9]+)\s*')
+    _IFS_RE = re.compile(r'[ \t\n]+')
+    _OPERATORS = [';;', '&&', '||', '>>', '<<', '<&', '>&', ';', '&', '|', '(', ')', '<', '>', '\n']
+    _KEYWORDS = {'if', 'then', 'elif', 'else', 'fi', 'case', 'esac', 'in', '[[', ']]',
+                 'for', 'while', 'until', 'do', 'done', 'select', 'function', '{', '}', '!', 'time'}
+    # Variables bash computes on the fly, these cannot be emulated
+    _DYNAMIC = {'RANDOM', 'SRANDOM', 'SECONDS', 'LINENO', 'BASHPID', 'EPOCHSECONDS', 'EPOCHREALTIME',
+                'BASH_SOURCE', 'BASH_LINENO', 'BASH_ARGV', 'BASH_ARGC', 'BASH_COMMAND', 'FUNCNAME',
+                'HOSTNAME', 'HOSTTYPE', 'OSTYPE', 'MACHTYPE', 'BASH', 'BASH_VERSION', 'BASH_VERSINFO',
+                'UID', 'EUID', 'PPID', 'GROUPS', 'PIPESTATUS', 'DIRSTACK', '_'}
+    _CONDITION_OPERATORS = {'=', '==', '!=', '=~', '<', '>', '-eq', '-ne', '-lt', '-le', '-gt', '-ge'}
+    _MAX_DEPTH = 64
+
+    def __init__(self, variables: Dict[str, str], exported: set = None, readonly: set = None):
+        """
+        Parameters
+        ----------
+        variables : dict
+                    shell variables (name: value) to start from, e.g. os.environ
+        exported : set
+                   names of the variables that are exported.
+                   default: all of `variables`
+        readonly : set
+                   names of the variables that are read-only
+                   default: none
+        """
+        self.variables = dict(variables)
+        self.exported = set(self.variables) if exported is None else set(exported)
+        self.readonly = set() if readonly is None else set(readonly)
+        self.status = 0
+        self._positional = [[]]
+        self._parsed = dict()
+
+    def copy(self) -> 'ShellSubsetEvaluator':
+        """
+        Return an independent evaluator with the same state (like a subshell)
+        """
+        other = ShellSubsetEvaluator(self.variables, self.exported, self.readonly)
+        other.status = self.status
+        other._parsed = self._parsed
+        return other
+
+    @property
+    def environment(self) -> Dict[str, str]:
+        """
+        The environment a command run at this point would receive (i.e. `env`)
+        """
+        return {name: self.variables[name] for name in self.exported if name in self.variables}
+
+    @classmethod
+    def get_script_env(cls, scripts: List) -> Dict[str, str]:
+        """
+        In-process equivalent of `Configuration._get_script_env`:
+        the variables exported by `scripts` that are not in the current environment
+        """
+        evaluator = cls(os.environ)
+        for script in scripts:
+            evaluator.source(script)
+        environment = evaluator.environment
+        return {name: environment[name] for name in set(environment) - set(os.environ)}
+
+    def source(self, script: str, args: List[str] = None) -> int:
+        """
+        Evaluate `script` in the current state, as `source script args` would
+        """
+        if len(self._positional) > self._MAX_DEPTH:
+            raise ShellSubsetError(f'{script}: source nested too deeply')
+        try:
+            with open(script, 'r') as fh:
+                text = fh.read()
+        except OSError as exc:
+            raise ShellSubsetError(f'{script}: {exc}')
+
+        if script not in self._parsed:
+            self._parsed[script] = self._parse(self._tokenize(text))
+
+        self._positional.append(list(args or []))
+        try:
+            self.status = self._exec_list(self._parsed[script])
+        finally:
+            self._positional.pop()
+        return self.status
+
+    # ---- lexer
+
+    def _tokenize(self, text: str) -> List[tuple]:
+        """
+        Split `text` into ('word', raw_text) and ('op', operator) tokens.
+        Words are kept raw (quotes and all); they are expanded when executed.
+        """
+        tokens = []
+        ii = 0
+        nn = len(text)
+        while ii < nn:
+            cc = text[ii]
+            if cc in ' \t':
+                ii += 1
+            elif text.startswith('\\\n', ii):
+                ii += 2
+            elif cc == '#':
+                while ii < nn and text[ii] != '\n':
+                    ii += 1
+            elif tokens and tokens[-1] == ('word', '=~'):
+                # the right hand side of =~ in [[ ]] is a regular expression, which may contain ( ) | < >
+                jj = self._scan_word(text, ii, regex=True)
+                tokens.append(('word', text[ii:jj]))
+                ii = jj
+            else:
+                for op in self._OPERATORS:
+                    if text.startswith(op, ii):
+                        tokens.append(('op', op))
+                        ii += len(op)
+                        break
+                else:
+                    jj = self._scan_word(text, ii)
+                    tokens.append(('word', text[ii:jj]))
+                    ii = jj
+        return tokens
+
+    def _scan_word(self, text: str, ii: int, regex: bool = False) -> int:
+        """
+        Return the index just past the word starting at `ii`
+        """
+        nn = len(text)
+        depth = 0
+        while ii < nn:
+            cc = text[ii]
+            if regex and cc in '()':
+                depth += 1 if cc == '(' else -1
+                ii += 1
+            elif regex and cc in ' \t\n':
+                if depth == 0:
+                    return ii
+                ii += 1
+            elif regex and cc in ';&|<>':
+                ii += 1
+            elif cc in ' \t\n;&|()<>':
+                return ii
+            elif cc == '\\':
+                ii += 2
+            elif cc == "'":
+                ii = self._scan_to(text, ii + 1, "'") + 1
+            elif cc == '"':
+                ii = self._scan_double_quoted(text, ii + 1) + 1
+            elif cc == '`':
+                ii = self._scan_to(text, ii + 1, '`') + 1
+            elif cc == '$' and text.startswith('${', ii):
+                ii = self._scan_balanced(text, ii + 2, '{', '}') + 1
+            elif cc == '$' and text.startswith('$(', ii):
+                ii = self._scan_balanced(text, ii + 2, '(', ')') + 1
+            else:
+                ii += 1
+        return ii
+
+    @staticmethod
+    def _scan_to(text: str, ii: int, end: str) -> int:
+        jj = text.find(end, ii)
+        if jj < 0:
+            raise ShellSubsetError(f'unterminated {end}')
+        return jj
+
+    def _scan_double_quoted(self, text: str, ii: int) -> int:
+        nn = len(text)
+        while ii < nn:
+            cc = text[ii]
+            if cc == '"':
+                return ii
+            elif cc == '\\':
+                ii += 2
+            elif cc == '`':
+                ii = self._scan_to(text, ii + 1, '`') + 1
+            elif text.startswith('${', ii):
+                ii = self._scan_balanced(text, ii + 2, '{', '}') + 1
+            elif text.startswith('$(', ii):
+                ii = self._scan_balanced(text, ii + 2, '(', ')') + 1
+            else:
+                ii += 1
+        raise ShellSubsetError('unterminated "')
+
+    def _scan_balanced(self, text: str, ii: int, opening: str, closing: str) -> int:
+        depth = 1
+        nn = len(text)
+        while ii < nn:
+            cc = text[ii]
+            if cc == '\\':
+                ii += 2
+                continue
+            elif cc == "'" and opening == '(':
+                ii = self._scan_to(text, ii + 1, "'")
+            elif cc == '"':
+                ii = self._scan_double_quoted(text, ii + 1)
+            elif cc == opening:
+                depth += 1
+            elif cc == closing:
+                depth -= 1
+                if depth == 0:
+                    return ii
+            ii += 1
+        raise ShellSubsetError(f'unterminated {opening}')
+
+    # ---- parser
+
+    def _parse(self, tokens: List[tuple]) -> List[tuple]:
+        self._tokens = tokens
+        self._pos = 0
+        statements = self._parse_list(terminators=())
+        if self._pos < len(self._tokens):
+            raise ShellSubsetError(f'unexpected {self._tokens[self._pos][1]!r}')
+        return statements
+
+    def _peek(self) -> tuple:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+    def _next(self) -> tuple:
+        token = self._peek()
+        self._pos += 1
+        return token
+
+    def _expect(self, word: str) -> None:
+        kind, value = self._next()
+        if kind != 'word' or value != word:
+            raise ShellSubsetError(f'expected {word!r}, got {value!r}')
+
+    def _skip_separators(self) -> None:
+        while self._peek() in (('op', '\n'), ('op', ';')):
+            self._pos += 1
+
+    def _parse_list(self, terminators: tuple) -> List[tuple]:
+        """
+        Parse statements until one of the `terminators` keywords (or `;;`, `)`, end of input)
+        """
+        statements = []
+        while True:
+            self._skip_separators()
+            kind, value = self._peek()
+            if kind is None or (kind == 'word' and value in terminators) or (kind == 'op' and value in (';;', ')')):
+                return statements
+            statements.append(self._parse_and_or())
+            kind, value = self._peek()
+            if kind == 'op' and value not in ('\n', ';', ';;', ')'):
+                raise ShellSubsetError(f'unsupported operator {value!r}')
+
+    def _parse_and_or(self) -> tuple:
+        first = self._parse_pipeline()
+        rest = []
+        while self._peek() in (('op', '&&'), ('op', '||')):
+            op = self._next()[1]
+            while self._peek() == ('op', '\n'):
+                self._pos += 1
+            rest.append((op, self._parse_pipeline()))
+        if self._peek() == ('op', '&'):
+            self._pos += 1
+            return ('unsupported', 'background jobs are not supported')
+        return ('and_or', first, rest)
+
+    def _parse_pipeline(self) -> tuple:
+        """
+        Parse a command with its redirections and pipes.
+        Constructs that are not supported are parsed into an 'unsupported' node,
+        which raises ShellSubsetError only if it is executed.
+        """
+        prefix = self._peek()
+        if prefix in (('word', '!'), ('word', 'time')):
+            self._pos += 1
+        command = self._parse_command()
+        while True:
+            kind, value = self._peek()
+            if (kind, value) == ('op', '|'):
+                self._pos += 1
+                while self._peek() == ('op', '\n'):
+                    self._pos += 1
+                self._parse_command()
+                command = ('unsupported', 'pipelines are not supported')
+            elif (kind, value) == ('op', '<<'):
+                raise ShellSubsetError('here-documents are not supported')
+            elif kind == 'op' and value in ('<', '>', '>>', '<&', '>&'):
+                self._pos += 1
+                while self._peek()[0] == 'word':
+                    self._pos += 1
+                command = ('unsupported', 'redirections are not supported')
+            else:
+                break
+        if prefix in (('word', '!'), ('word', 'time')):
+            return ('unsupported', f'{prefix[1]} is not supported')
+        return command
+
+    def _parse_command(self) -> tuple:
+        kind, value = self._peek()
+        if kind != 'word':
+            if value == '(':
+                self._skip_parentheses()
+                return ('unsupported', 'subshells and arithmetic commands are not supported')
+            raise ShellSubsetError(f'unexpected {value!r}')
+        if value == 'if':
+            return self._parse_if()
+        elif value == 'case':
+            return self._parse_case()
+        elif value == '[[':
+            self._pos += 1
+            condition = []
+            while self._peek() != ('word', ']]'):
+                if self._peek()[0] is None or self._peek() == ('op', '\n'):
+                    raise ShellSubsetError('unterminated [[')
+                condition.append(self._next())
+            self._pos += 1
+            return ('cond', condition)
+        elif value == '{':
+            self._pos += 1
+            body = self._parse_list(terminators=('}',))
+            self._expect('}')
+            return ('group', body)
+        elif value in ('for', 'while', 'until', 'select'):
+            self._pos += 1
+            self._parse_list(terminators=('do',))
+            self._expect('do')
+            self._parse_list(terminators=('done',))
+            self._expect('done')
+            return ('unsupported', f'{value} loops are not supported')
+        elif value == 'function':
+            self._pos += 1
+            self._next()
+            return self._parse_function()
+        elif value in self._KEYWORDS:
+            raise ShellSubsetError(f'unexpected {value!r}')
+
+        words = []
+        while self._peek()[0] == 'word':
+            words.append(self._next()[1])
+        if self._peek() == ('op', '('):
+            return self._parse_function()
+        return ('simple', words)
+
+    def _parse_function(self) -> tuple:
+        if self._peek() == ('op', '('):
+            self._pos += 1
+            if self._next() != ('op', ')'):
+                raise ShellSubsetError('expected ) in function definition')
+        self._skip_separators()
+        self._parse_pipeline()
+        return ('unsupported', 'functions are not supported')
+
+    def _skip_parentheses(self) -> None:
+        depth = 0
+        while True:
+            token = self._next()
+            if token[0] is None:
+                raise ShellSubsetError('unterminated (')
+            elif token == ('op', '('):
+                depth += 1
+            elif token == ('op', ')'):
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _parse_if(self) -> tuple:
+        self._expect('if')
+        branches = []
+        orelse = None
+        while True:
+            condition = self._parse_list(terminators=('then',))
+            self._expect('then')
+            body = self._parse_list(terminators=('elif', 'else', 'fi'))
+            branches.append((condition, body))
+            keyword = self._next()[1]
+            if keyword == 'elif':
+                continue
+            if keyword == 'else':
+                orelse = self._parse_list(terminators=('fi',))
+                self._expect('fi')
+            elif keyword != 'fi':
+                raise ShellSubsetError(f'unterminated if')
+            return ('if', branches, orelse)
+
+    def _parse_case(self) -> tuple:
+        self._expect('case')
+        kind, word = self._next()
+        if kind != 'word':
+            raise ShellSubsetError('missing case word')
+        self._skip_separators()
+        self._expect('in')
+        items = []
+        while True:
+            self._skip_separators()
+            if self._peek() == ('word', 'esac'):
+                self._pos += 1
+                return ('case', word, items)
+            if self._peek() == ('op', '('):
+                self._pos += 1
+            patterns = []
+            while True:
+                kind, pattern = self._next()
+                if kind != 'word':
+                    raise ShellSubsetError('missing case pattern')
+                patterns.append(pattern)
+                kind, value = self._next()
+                if (kind, value) == ('op', ')'):
+                    break
+                if (kind, value) != ('op', '|'):
+                    raise ShellSubsetError(f'unexpected {value!r} in case pattern')
+            body = self._parse_list(terminators=('esac',))
+            items.append((patterns, body))
+            if self._peek() == ('op', ';;'):
+                self._pos += 1
+            elif self._peek() != ('word', 'esac'):
+                raise ShellSubsetError(f'unsupported case terminator {self._peek()[1]!r}')
+
+    # ---- execution
+
+    def _exec_list(self, statements: List[tuple]) -> int:
+        status = self.status
+        for statement in statements:
+            status = self._exec(statement)
+        return status
+
+    def _exec(self, node: tuple) -> int:
+        kind = node[0]
+        if kind == 'and_or':
+            status = self._exec(node[1])
+            for op, command in node[2]:
+                if (op == '&&' and status == 0) or (op == '||' and status != 0):
+                    status = self._exec(command)
+        elif kind == 'if':
+            status = 0
+            for condition, body in node[1]:
+                if self._exec_list(condition) == 0:
+                    status = self._exec_list(body)
+                    break
+            else:
+                if node[2] is not None:
+                    status = self._exec_list(node[2])
+        elif kind == 'case':
+            status = 0
+            word = self._expand_string(node[1])
+            for patterns, body in node[2]:
+                if any(re.fullmatch(self._expand_pattern(pattern), word, re.DOTALL) for pattern in patterns):
+                    status = self._exec_list(body)
+                    break
+        elif kind == 'cond':
+            tokens = list(node[1])
+            result = self._cond_or(tokens)
+            if tokens:
+                raise ShellSubsetError(f'unexpected {tokens[0][1]!r} in [[')
+            status = 0 if result else 1
+        elif kind == 'group':
+            status = self._exec_list(node[1])
+        elif kind == 'unsupported':
+            raise ShellSubsetError(node[1])
+        else:
+            status = self._exec_simple(node[1])
+        self.status = status
+        return status
+
+    def _exec_simple(self, words: List[str]) -> int:
+        assignments = []
+        while words and self._ASSIGNMENT_RE.match(words[0]):
+            assignments.append(words[0])
+            words = words[1:]
+        if not words:
+            for word in assignments:
+                self._assign_word(word)
+            return 0
+        if assignments:
+            raise ShellSubsetError('assignments preceding a command are not supported')
+
+        command = self._expand_fields(words[0])
+        if len(command) != 1:
+            raise ShellSubsetError(f'unsupported command {words[0]!r}')
+        command = command[0]
+
+        if command in ('export', 'declare', 'typeset', 'readonly'):
+            return self._declare(command, words[1:])
+
+        args = [field for word in words[1:] for field in self._expand_fields(word)]
+        if command == 'unset':
+            if args and args[0] == '-v':
+                args = args[1:]
+            for name in args:
+                if not self._NAME_RE.fullmatch(name):
+                    raise ShellSubsetError(f'unsupported unset {name!r}')
+                if name in self.readonly:
+                    raise ShellSubsetError(f'{name}: readonly variable')
+                self.variables.pop(name, None)
+                self.exported.discard(name)
+            return 0
+        elif command in ('source', '.'):
+            if not args or '/' not in args[0]:
+                raise ShellSubsetError(f'unsupported source {args!r}')
+            return self.source(args[0], args[1:])
+        elif command == 'printf' and args and args[0] == '-v':
+            raise ShellSubsetError('printf -v is not supported')
+        elif command in ('echo', 'printf', ':', 'true'):
+            return 0
+        elif command == 'false':
+            return 1
+        elif command in ('[', 'test'):
+            if command == '[':
+                if not args or args[-1] != ']':
+                    raise ShellSubsetError('missing ]')
+                args = args[:-1]
+            return 0 if self._test(args) else 1
+
+        raise ShellSubsetError(f'unsupported command {command!r}')
+
+    def _declare(self, command: str, words: List[str]) -> int:
+        export = command == 'export'
+        readonly = command == 'readonly'
+        while words and words[0].startswith('-'):
+            flags = words.pop(0)[1:]
+            if command == 'export' or not flags or set(flags) - set('rx'):
+                raise ShellSubsetError(f'unsupported {command} option -{flags}')
+            export = export or 'x' in flags
+            readonly = readonly or 'r' in flags
+        for word in words:
+            if self._ASSIGNMENT_RE.match(word):
+                name = self._assign_word(word)
+            else:
+                names = self._expand_fields(word)
+                if not all(self._NAME_RE.fullmatch(name) for name in names):
+                    raise ShellSubsetError(f'unsupported {command} argument {word!r}')
+                if len(names) != 1:
+                    raise ShellSubsetError(f'unsupported {command} argument {word!r}')
+                name = names[0]
+            if export:
+                self.exported.add(name)
+            if readonly:
+                self.readonly.add(name)
+        return 0
+
+    def _assign_word(self, word: str) -> str:
+        name = self._ASSIGNMENT_RE.match(word).group(1)
+        value = word[len(name) + 1:]
+        if value.startswith('~') or value.startswith('('):
+            raise ShellSubsetError(f'unsupported assignment {word!r}')
+        self._assign(name, self._expand_string(value))
+        return name
+
+    def _assign(self, name: str, value: str) -> None:
+        if name in self.readonly:
+            raise ShellSubsetError(f'{name}: readonly variable')
+        if name in self._DYNAMIC:
+            raise ShellSubsetError(f'{name}: assignment to a bash dynamic variable')
+        self.variables[name] = value
+
+    # ---- conditions
+
+    def _cond_or(self, tokens: List[tuple]) -> bool:
+        result = self._cond_and(tokens)
+        while tokens and tokens[0] == ('op', '||'):
+            tokens.pop(0)
+            rhs = self._cond_and(tokens)
+            result = result or rhs
+        return result
+
+    def _cond_and(self, tokens: List[tuple]) -> bool:
+        result = self._cond_not(tokens)
+        while tokens and tokens[0] == ('op', '&&'):
+            tokens.pop(0)
+            rhs = self._cond_not(tokens)
+            result = result and rhs
+        return result
+
+    def _cond_not(self, tokens: List[tuple]) -> bool:
+        if tokens and tokens[0] == ('word', '!'):
+            tokens.pop(0)
+            return not self._cond_not(tokens)
+        if tokens and tokens[0] == ('op', '('):
+            tokens.pop(0)
+            result = self._cond_or(tokens)
+            if not tokens or tokens.pop(0) != ('op', ')'):
+                raise ShellSubsetError('missing ) in [[')
+            return result
+        return self._cond_primary(tokens)
+
+    def _cond_primary(self, tokens: List[tuple]) -> bool:
+        if not tokens or tokens[0][0] != 'word':
+            raise ShellSubsetError('missing operand in [[')
+        first = tokens.pop(0)[1]
+        if self._is_unary(first) and tokens and tokens[0][0] == 'word':
+            return self._unary(first, self._expand_string(tokens.pop(0)[1]))
+        if tokens and tokens[0][1] in self._CONDITION_OPERATORS:
+            op = tokens.pop(0)[1]
+            if not tokens or tokens[0][0] != 'word':
+                raise ShellSubsetError(f'missing operand for {op} in [[')
+            rhs = tokens.pop(0)[1]
+            lhs = self._expand_string(first)
+            if op in ('=', '=='):
+                return re.fullmatch(self._expand_pattern(rhs), lhs, re.DOTALL) is not None
+            elif op == '!=':
+                return re.fullmatch(self._expand_pattern(rhs), lhs, re.DOTALL) is None
+            elif op == '=~':
+                return re.search(self._expand_pattern(rhs, regex=True), lhs) is not None
+            elif op in ('<', '>'):
+                return self._binary(op, lhs, self._expand_string(rhs))
+            return self._binary(op, self._arithmetic(lhs), self._arithmetic(self._expand_string(rhs)))
+        return self._expand_string(first) != ''
+
+    def _test(self, args: List[str]) -> bool:
+        """
+        POSIX `test` for up to 4 arguments
+        """
+        if not args:
+            return False
+        if args[0] == '!' and len(args) in (2, 3, 4):
+            return not self._test(args[1:])
+        if len(args) == 1:
+            return args[0] != ''
+        if len(args) == 2 and self._is_unary(args[0]):
+            return self._unary(args[0], args[1])
+        if len(args) == 3 and args[1] in ('=', '==', '!=', '<', '>'):
+            return self._binary(args[1], args[0], args[2])
+        if len(args) == 3 and args[1] in ('-eq', '-ne', '-lt', '-le', '-gt', '-ge'):
+            lhs, rhs = (self._INTEGER_RE.fullmatch(arg) for arg in (args[0], args[2]))
+            if lhs is None or rhs is None:
+                raise ShellSubsetError(f'integer expression expected: {args!r}')
+            return self._binary(args[1], int(''.join(lhs.groups())), int(''.join(rhs.groups())))
+        if len(args) == 3 and args[0] == '(' and args[2] == ')':
+            return args[1] != ''
+        raise ShellSubsetError(f'unsupported test {args!r}')
+
+    @staticmethod
+    def _is_unary(op: str) -> bool:
+        return op in ('-z', '-n', '-e', '-a', '-f', '-d', '-r', '-w', '-x', '-s', '-L', '-h')
+
+    @staticmethod
+    def _unary(op: str, value: str) -> bool:
+        if op == '-z':
+            return value == ''
+        elif op == '-n':
+            return value != ''
+        elif op in ('-e', '-a'):
+            return os.path.exists(value)
+        elif op == '-f':
+            return os.path.isfile(value)
+        elif op == '-d':
+            return os.path.isdir(value)
+        elif op == '-r':
+            return os.access(value, os.R_OK)
+        elif op == '-w':
+            return os.access(value, os.W_OK)
+        elif op == '-x':
+            return os.access(value, os.X_OK)
+        elif op == '-s':
+            return os.path.isfile(value) and os.path.getsize(value) > 0
+        return os.path.islink(value)
+
+    @staticmethod
+    def _binary(op: str, lhs: Any, rhs: Any) -> bool:
+        return {'=': lhs == rhs, '==': lhs == rhs, '!=': lhs != rhs, '<': lhs < rhs, '>': lhs > rhs,
+                '-eq': lhs == rhs, '-ne': lhs != rhs, '-lt': lhs < rhs,
+                '-le': lhs <= rhs, '-gt': lhs > rhs, '-ge': lhs >= rhs}[op]
+
+    def _arithmetic(self, value: str, depth: int = 0) -> int:
+        """
+        Evaluate an operand of an arithmetic comparison in [[ ]]:
+        an (octal if 0-prefixed) integer, empty, or the name of a variable holding one
+        """
+        if depth > self._MAX_DEPTH:
+            raise ShellSubsetError(f'arithmetic recursion: {value!r}')
+        value = value.strip()
+        if value == '':
+            return 0
+        match = self._INTEGER_RE.fullmatch(value)
+        if match:
+            sign, digits = match.groups()
+            try:
+                number = int(digits, 8) if len(digits) > 1 and digits.startswith('0') else int(digits)
+            except ValueError:
+                raise ShellSubsetError(f'value too great for base: {value!r}')
+            return -number if sign == '-' else number
+        if self._NAME_RE.fullmatch(value):
+            return self._arithmetic(self._parameter(value) or '', depth + 1)
+        raise ShellSubsetError(f'unsupported arithmetic expression {value!r}')
+
+    # ---- expansions
+
+    def _expand_string(self, word: str) -> str:
+        """
+        Expand `word` without field splitting (assignments, [[ ]] operands, case word)
+        """
+        return ''.join(text for text, quoted, literal in self._expand_pieces(word))
+
+    def _expand_fields(self, word: str) -> List[str]:
+        """
+        Expand `word` into fields, with field splitting of unquoted expansions
+        Pathname expansion is only supported for patterns that match no file (they expand to themselves)
+        """
+        fields = []
+        current = None
+        for text, quoted, literal in self._expand_pieces(word):
+            if quoted or literal:
+                field, pattern, magic = current or ('', '', False)
+                if quoted:
+                    current = (field + text, pattern + glob.escape(text), magic)
+                else:
+                    current = (field + text, pattern + text, magic or glob.has_magic(text))
+                continue
+            for ii, part in enumerate(self._IFS_RE.split(text)):
+                if ii > 0 and current is not None:
+                    fields.append(current)
+                    current = None
+                if part:
+                    field, pattern, magic = current or ('', '', False)
+                    current = (field + part, pattern + part, magic or glob.has_magic(part))
+        if current is not None:
+            fields.append(current)
+
+        for field, pattern, magic in fields:
+            if magic and glob.glob(pattern):
+                raise ShellSubsetError(f'pathname expansion is not supported: {word!r}')
+        return [field for field, pattern, magic in fields]
+
+    def _expand_pattern(self, word: str, regex: bool = False) -> str:
+        """
+        Expand `word` into a python regular expression.
+        Quoted text matches literally; unquoted text is a glob pattern or, if `regex`, a regular expression.
+        """
+        result = ''
+        for text, quoted, literal in self._expand_pieces(word):
+            if quoted:
+                result += re.escape(text)
+            elif regex:
+                result += text
+            else:
+                result += self._glob_to_regex(text)
+        return result
+
+    @staticmethod
+    def _glob_to_regex(pattern: str) -> str:
+        result = ''
+        ii = 0
+        while ii < len(pattern):
+            cc = pattern[ii]
+            if cc == '*':
+                result += '.*'
+            elif cc == '?':
+                result += '.'
+            elif cc == '[':
+                jj = pattern.find(']', ii + 2)
+                if jj < 0:
+                    result += re.escape(cc)
+                else:
+                    chars = pattern[ii + 1:jj]
+                    if chars[0] in '!^':
+                        chars = '^' + chars[1:]
+                    result += '[' + chars.replace('\\', '\\\\') + ']'
+                    ii = jj
+            else:
+                result += re.escape(cc)
+            ii += 1
+        return result
+
+    def _expand_pieces(self, word: str) -> List[tuple]:
+        """
+        Expand a raw word into a list of (text, quoted, literal) pieces
+        """
+        pieces = []
+        ii = 0
+        nn = len(word)
+        if word.startswith('~'):
+            raise ShellSubsetError(f'tilde expansion is not supported: {word!r}')
+        while ii < nn:
+            cc = word[ii]
+            if cc == '\\':
+                if word[ii + 1:ii + 2] != '\n':
+                    pieces.append((word[ii + 1:ii + 2], True, True))
+                ii += 2
+            elif cc == "'":
+                jj = word.index("'", ii + 1)
+                pieces.append((word[ii + 1:jj], True, True))
+                ii = jj + 1
+            elif cc == '"':
+                jj = self._scan_double_quoted(word, ii + 1)
+                pieces.extend(self._expand_double_quoted(word[ii + 1:jj]))
+                if ii + 1 == jj:
+                    pieces.append(('', True, True))
+                ii = jj + 1
+            elif cc == '$':
+                text, ii = self._expand_dollar(word, ii)
+                pieces.append((text, False, text == '$'))
+            elif cc == '`':
+                raise ShellSubsetError('command substitution is not supported')
+            else:
+                jj = ii
+                while jj < nn and word[jj] not in '\\\'"$`':
+                    jj += 1
+                pieces.append((word[ii:jj], False, True))
+                ii = jj
+        return pieces
+
+    def _expand_double_quoted(self, text: str) -> List[tuple]:
+        pieces = []
+        ii = 0
+        nn = len(text)
+        while ii < nn:
+            cc = text[ii]
+            if cc == '\\':
+                nxt = text[ii + 1:ii + 2]
+                if nxt in ('$', '`', '"', '\\'):
+                    pieces.append((nxt, True, True))
+                elif nxt != '\n':
+                    pieces.append((cc + nxt, True, True))
+                ii += 2
+            elif cc == '$':
+                value, ii = self._expand_dollar(text, ii)
+                pieces.append((value, True, False))
+            elif cc == '`':
+                raise ShellSubsetError('command substitution is not supported')
+            else:
+                jj = ii
+                while jj < nn and text[jj] not in '\\$`':
+                    jj += 1
+                pieces.append((text[ii:jj], True, True))
+                ii = jj
+        return pieces
+
+    def _expand_dollar(self, word: str, ii: int) -> tuple:
+        """
+        Expand the $-expression starting at word[ii]; return its value and the index past it
+        """
+        if word.startswith('${', ii):
+            jj = self._scan_balanced(word, ii + 2, '{', '}')
+            return self._expand_braced(word[ii + 2:jj]), jj + 1
+        if word.startswith('$(', ii):
+            raise ShellSubsetError('command substitution and arithmetic expansion are not supported')
+        match = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|[0-9?#]').match(word, ii + 1)
+        if match is None:
+            if word[ii + 1:ii + 2] and word[ii + 1] in '@*$!-':
+                raise ShellSubsetError(f'unsupported parameter ${word[ii + 1]}')
+            return '$', ii + 1
+        return self._parameter(match.group(0)) or '', match.end()
+
+    def _expand_braced(self, expression: str) -> str:
+        if expression.startswith('#') and len(expression) > 1:
+            return str(len(self._parameter(expression[1:]) or ''))
+        match = self._PARAMETER_RE.fullmatch(expression)
+        if match is None:
+            raise ShellSubsetError(f'unsupported parameter expansion ${{{expression}}}')
+        name, operation = match.groups()
+        value = self._parameter(name)
+        if operation == '':
+            return value or ''
+        if operation in (',,', '^^', ',', '^'):
+            value = value or ''
+            if operation == ',,':
+                return value.lower()
+            elif operation == '^^':
+                return value.upper()
+            elif operation == ',':
+                return value[:1].lower() + value[1:]
+            return value[:1].upper() + value[1:]
+
+        match = re.match(r'(:?)([-=+?])(.*)', operation, re.DOTALL)
+        if match is None:
+            raise ShellSubsetError(f'unsupported parameter expansion ${{{expression}}}')
+        colon, op, word = match.groups()
+        is_set = value is not None and (value != '' or not colon)
+        if op == '+':
+            return self._expand_string(word) if is_set else ''
+        if is_set:
+            return value
+        if op == '-':
+            return self._expand_string(word)
+        if op == '=' and self._NAME_RE.fullmatch(name):
+            value = self._expand_string(word)
+            self._assign(name, value)
+            return value
+        raise ShellSubsetError(f'unsupported parameter expansion ${{{expression}}}')
+
+    def _parameter(self, name: str) -> Union[str, None]:
+        """
+        Value of variable or special parameter `name`, None if unset
+        """
+        if name.isdigit():
+            args = self._positional[-1]
+            index = int(name)
+            if index == 0:
+                raise ShellSubsetError('$0 is not supported')
+            return args[index - 1] if index <= len(args) else None
+        elif name == '#':
+            return str(len(self._positional[-1]))
+        elif name == '?':
+            return str(self.status)
+        elif name in self._DYNAMIC:
+            raise ShellSubsetError(f'${name} is not supported')
+        return self.variables.get(name)
+
+
+class LazyDtypeDict(AttrDict):
+    """
+    AttrDict of str values (e.g. the environment) that are cast into datatypes
+    with `cast_as_dtype` on first access, and memoized.
+
+    Methods that need all the values (items, values, ==, repr, `**` unpacking, ...)
+    cast the values that are still pending; copy and `|` keep them pending
+    (and, as for AttrDict, copy the nested dictionaries and lists).
+    """
+
+    def __init__(__self, *args, **kwargs):
+        object.__setattr__(__self, '_pending', set())
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def from_strdict(cls, ctx: Dict[str, str]) -> 'LazyDtypeDict':
+        """
+        Create a LazyDtypeDict from a dictionary with values as str, without casting any of them
+        """
+        varbles = cls()
+        dict.update(varbles, ctx)
+        varbles._pending.update(dict.keys(varbles))
+        return varbles
+
+    def _cast(self, key: str) -> None:
+        self._pending.discard(key)
+        dict.__setitem__(self, key, cast_as_dtype(dict.__getitem__(self, key)))
+
+    def _cast_all(self) -> None:
+        for key in list(self._pending):
+            self._cast(key)
+
+    def __getitem__(self, key):
+        if key in self._pending:
+            self._cast(key)
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        self._pending.discard(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._pending.discard(key)
+        super().__delitem__(key)
+
+    def __iter__(self):
+        # Not inheriting dict.__iter__ makes dict(self) and `**self` go through __getitem__
+        return super().__iter__()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *args):
+        if key in self._pending:
+            self._cast(key)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        self._cast_all()
+        return super().popitem()
+
+    def items(self):
+        self._cast_all()
+        return super().items()
+
+    def values(self):
+        self._cast_all()
+        return super().values()
+
+    def __eq__(self, other):
+        self._cast_all()
+        if isinstance(other, LazyDtypeDict):
+            other._cast_all()
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self._cast_all()
+        return super().__repr__()
+
+    def copy(self):
+        # As AttrDict(self): the nested dictionaries and lists are copied (a nested update
+        # of the copy, e.g. by `|`, does not show in self); the pending values are str
+        other = self.__class__()
+        for key, val in dict.items(self):
+            if isinstance(val, (dict, list, tuple)):
+                val = AttrDict._hook(val)
+            dict.__setitem__(other, key, val)
+        other._pending.update(self._pending)
+        return other
+
+    def __or__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        new = self.copy()
+        new.update(other)
+        return new
+
+
+def cast_strdict_as_dtypedict(ctx: Dict[str, str], lazy: bool = False) -> Dict[str, Any]:
     """
     Environment variables are typically stored as str
     This method attempts to translate those into datatypes
@@ -130,17 +1525,35 @@ def cast_strdict_as_dtypedict(ctx: Dict[str, str]) -> Dict[str, Any]:
     ----------
     ctx : dict
           dictionary with values as str
+    lazy : bool
+           cast the values on first access instead (see `LazyDtypeDict`)
+           default: False
     Returns
     -------
     varbles : dict
               dictionary with values as datatypes
     """
+    if lazy:
+        return LazyDtypeDict.from_strdict(ctx)
+
     varbles = AttrDict()
     for key, value in ctx.items():
         varbles[key] = cast_as_dtype(value)
     return varbles
 
 
+_TRUTHS = ('y', 'yes', 't', 'true', '.t.', '.true.')
+_BOOLS = ('n', 'no', 'f', 'false', '.f.', '.false.') + _TRUTHS
+_BOOLS = frozenset([x.upper() for x in _BOOLS] + list(_BOOLS) + ['Yes', 'No', 'True', 'False'])
+
+# Classifies a str as a (possible) datetime, an int or a float in a single match
+_DTYPE_RE = re.compile(r'(?P<datetime>\d{4}-?\d{2}-?\d{2})'
+                       r'|(?P<int>[+-]?[0-9]+)\Z'
+                       r'|(?P<float>[+-]?(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)\Z')
+# Anything that does not match this cannot be cast into an int or a float
+_NUMBER_RE = re.compile(r'[\d\s_.eE+-]+\Z')
+
+
 def cast_as_dtype(string: str) -> Union[str, int, float, bool, Any]:
     """
     Cast a value into known datatype
@@ -152,28 +1565,98 @@ def cast_as_dtype(string: str) -> Union[str, int, float, bool, Any]:
     value : str or int or float or datetime
             default: str
     """
-    TRUTHS = ['y', 'yes', 't', 'true', '.t.', '.true.']
-    BOOLS = ['n', 'no', 'f', 'false', '.f.', '.false.'] + TRUTHS
-    BOOLS = [x.upper() for x in BOOLS] + BOOLS + ['Yes', 'No', 'True', 'False']
-
-    def _cast_or_not(type: Any, string: str):
+    match = _DTYPE_RE.match(string)
+    if match is not None:
+        if match.lastgroup == 'int':
+            return int(string)
+        elif match.lastgroup == 'float':
+            return float(string)
         try:
-            return type(string)
-        except ValueError:
-            return string
+            return to_datetime(string)  # Looks like a datetime
+        except Exception:
+            pass  # e.g. an out of range month, may still be a number
 
-    def _true_or_not(string: str):
-        try:
-            return string.lower() in TRUTHS
-        except AttributeError:
-            return string
+    if string in _BOOLS:  # Likely a boolean, convert to True/False
+        return string.lower() in _TRUTHS
+    elif _NUMBER_RE.match(string) is None:
+        return string
 
     try:
-        return to_datetime(string)  # Try as a datetime
-    except Exception as exc:
-        if string in BOOLS:  # Likely a boolean, convert to True/False
-            return _true_or_not(string)
-        elif '.' in string:  # Likely a number and that too a float
-            return _cast_or_not(float, string)
-        else:  # Still could be a number, may be an integer
-            return _cast_or_not(int, string)
+        return float(string) if '.' in string else int(string)
+    except ValueError:
+        return string
+
+
+def write_config_snapshot(config: Dict[str, str], path: Union[str, Path]) -> None:
+    """
+    Write a snapshot of `config`, e.g. from `Configuration.parse_config(..., cast=False)`,
+    holding both the str value of each variable and its value cast into a datatype,
+    to be read by `load_config_snapshot`
+    Parameters
+    ----------
+    config : dict
+             dictionary with values as str
+    path : str or Path
+           snapshot file to write
+    """
+    _write_pickle({key: (value, cast_as_dtype(value)) for key, value in config.items()}, path)
+
+
+def load_config_snapshot(path: Union[str, Path], environ: Dict[str, str] = None) -> Dict[str, Any]:
+    """
+    Typed configuration of `environ`, taking the cast values from the snapshot at `path` where possible.
+
+    Variables that have the same value in `environ` as in the snapshot take the value cast
+    at the time the snapshot was written.  The others, e.g. the cycle dependent PDY, cyc or DATA,
+    and the variables that are not in the snapshot, are cast on first access (see `LazyDtypeDict`).
+    The result is thus always the same as `cast_strdict_as_dtypedict(environ)`.
+    Parameters
+    ----------
+    path : str or Path
+           snapshot file written by `write_config_snapshot`
+    environ : dict
+              environment of the task
+              default: os.environ
+    Returns
+    -------
+    config : LazyDtypeDict
+             dictionary with values as datatypes
+    """
+    environ = os.environ if environ is None else environ
+    with open(path, 'rb') as fh:
+        snapshot = pickle.load(fh)
+
+    config = LazyDtypeDict.from_strdict(environ)
+    pending = config._pending
+    for key, (string, value) in snapshot.items():
+        if key in pending and dict.__getitem__(config, key) == string:
+            # as LazyDtypeDict._cast, with the value cast when the snapshot was written
+            pending.discard(key)
+            dict.__setitem__(config, key, value)
+    return config
+
+
+def load_task_config(environ: Dict[str, str] = None) -> Dict[str, Any]:
+    """
+    Typed configuration of the running task.
+    If the environment variable CONFIG_SNAPSHOT_DIR is set (see `write_config_snapshot`),
+    the snapshot ${CONFIG_SNAPSHOT_DIR}/config.${job}.pkl, or else config.base.pkl, is used
+    with `load_config_snapshot`.  Otherwise, `environ` is cast lazily.
+    Parameters
+    ----------
+    environ : dict
+              environment of the task
+              default: os.environ
+    Returns
+    -------
+    config : LazyDtypeDict
+             dictionary with values as datatypes
+    """
+    environ = os.environ if environ is None else environ
+    snapshot_dir = environ.get('CONFIG_SNAPSHOT_DIR')
+    if snapshot_dir:
+        for name in [environ.get('job'), 'base']:
+            path = os.path.join(snapshot_dir, f'config.{name}.pkl')
+            if name and os.path.isfile(path):
+                return load_config_snapshot(path, environ)
+    return cast_strdict_as_dtypedict(environ, lazy=True)
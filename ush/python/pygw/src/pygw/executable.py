@@ -1,10 +1,17 @@
 import os
+import time
 import shlex
 import subprocess
 import sys
 from typing import Any, Optional, Union, List
 
-__all__ = ["Executable", "which", "CommandNotFoundError"]
+from . import metrics
+
+__all__ = ["Executable", "ExecutableProcess", "ExecutablePool", "which", "CommandNotFoundError"]
+
+_SUBPROCESSES = metrics.counter('pygw_subprocesses_total', 'Subprocesses launched by pygw.Executable')
+_SUBPROCESS_FAILURES = metrics.counter('pygw_subprocess_failures_total', 'Subprocesses of pygw.Executable exiting with an error code')
+_SUBPROCESS_SECONDS = metrics.histogram('pygw_subprocess_seconds', 'Run time of the subprocesses of pygw.Executable')
 
 
 class Executable:
@@ -151,6 +158,24 @@ class Executable:
 
         By default, the subprocess inherits the parent's file descriptors.
 
+        """
+        return self.start(*args, **kwargs).wait()
+
+    def start(self, *args, **kwargs) -> 'ExecutableProcess':
+        """
+        Start this executable in a subprocess, without waiting for it to complete.
+
+        Parameters:
+        -----------
+        *args (str): Command-line arguments to the executable to run
+
+        Keyword Arguments:
+        ------------------
+        The keyword arguments of ``__call__``
+
+        Returns:
+        --------
+        ExecutableProcess : handle of the subprocess (poll, wait, returncode)
         """
         # Environment
         env_arg = kwargs.get("env", None)
@@ -192,62 +217,23 @@ class Executable:
         istream, close_istream = streamify(input, "r")
         ostream, close_ostream = streamify(output, "w")
         estream, close_estream = streamify(error, "w")
+        streams = [stream for stream, close in ((istream, close_istream), (ostream, close_ostream),
+                                                (estream, close_estream)) if close]
 
         cmd = self.exe + list(args)
 
         escaped_cmd = ["'%s'" % arg.replace("'", "'\"'\"'") for arg in cmd]
         cmd_line_string = " ".join(escaped_cmd)
 
-        proc = None  # initialize to avoid lint warning
         try:
             proc = subprocess.Popen(cmd, stdin=istream, stderr=estream, stdout=ostream, env=env, close_fds=False)
-            out, err = proc.communicate()
-
-            result = None
-            if output in (str, str.split) or error in (str, str.split):
-                result = ""
-                if output in (str, str.split):
-                    outstr = str(out.decode("utf-8"))
-                    result += outstr
-                    if output is str.split:
-                        sys.stdout.write(outstr)
-                if error in (str, str.split):
-                    errstr = str(err.decode("utf-8"))
-                    result += errstr
-                    if error is str.split:
-                        sys.stderr.write(errstr)
-
-            rc = self.returncode = proc.returncode
-            if fail_on_error and rc != 0 and (rc not in ignore_errors):
-                long_msg = cmd_line_string
-                if result:
-                    # If the output is not captured in the result, it will have
-                    # been stored either in the specified files (e.g. if
-                    # 'output' specifies a file) or written to the parent's
-                    # stdout/stderr (e.g. if 'output' is not specified)
-                    long_msg += "\n" + result
-
-                raise ProcessError(f"Command exited with status {proc.returncode}:", long_msg)
-
-            return result
-
         except OSError as e:
+            for stream in streams:
+                stream.close()
             raise ProcessError(f"{self.exe[0]}: {e.strerror}", f"Command: {cmd_line_string}")
 
-        except subprocess.CalledProcessError as e:
-            if fail_on_error:
-                raise ProcessError(
-                    str(e),
-                    f"\nExit status {proc.returncode} when invoking command: {cmd_line_string}",
-                )
-
-        finally:
-            if close_ostream:
-                ostream.close()
-            if close_estream:
-                estream.close()
-            if close_istream:
-                istream.close()
+        return ExecutableProcess(self, proc, cmd, cmd_line_string, streams, output, error,
+                                 fail_on_error, ignore_errors)
 
     def __eq__(self, other):
         return hasattr(other, "exe") and self.exe == other.exe
@@ -265,6 +251,239 @@ class Executable:
         return " ".join(self.exe)
 
 
+class ExecutableProcess:
+    """
+    Handle of a subprocess started by ``Executable.start()``.
+    """
+
+    def __init__(self, executable: Executable, proc: subprocess.Popen, cmd: List[str], cmd_line_string: str,
+                 streams: List, output, error, fail_on_error: bool, ignore_errors):
+        self.executable = executable
+        self.proc = proc
+        self.cmd = cmd
+        self.cmd_line_string = cmd_line_string
+        self.result = None
+        self._streams = streams
+        self._output = output
+        self._error = error
+        self._fail_on_error = fail_on_error
+        self._ignore_errors = ignore_errors
+        self._start = time.perf_counter()
+        self._done = False
+
+    @property
+    def pid(self) -> int:
+        """
+        The process id of the subprocess.
+        """
+        return self.proc.pid
+
+    @property
+    def returncode(self) -> Optional[int]:
+        """
+        The return code of the subprocess, None if it is still running.
+        """
+        return self.proc.returncode
+
+    def poll(self) -> Optional[int]:
+        """
+        Check if the subprocess has completed (without raising a ProcessError if it failed, see ``wait``).
+
+        Returns:
+        --------
+        int : the return code of the subprocess, None if it is still running
+        """
+        return self.proc.poll()
+
+    def failed(self) -> bool:
+        """
+        True if the subprocess has completed with an error code that is not ignored.
+        """
+        rc = self.proc.returncode
+        return rc is not None and rc != 0 and rc not in self._ignore_errors
+
+    def wait(self, timeout: float = None):
+        """
+        Wait for the subprocess to complete.
+
+        Parameters:
+        -----------
+        timeout : float
+            Seconds to wait before raising ``subprocess.TimeoutExpired``, default: no timeout
+
+        Returns:
+        --------
+        The output and/or error captured as a string (see ``Executable.__call__``), None if they are not captured
+
+        Raises:
+        -------
+        ProcessError if the subprocess returned an error (unless ``fail_on_error`` is False)
+        """
+        if self._done:
+            return self.result
+
+        output, error = self._output, self._error
+        try:
+            out, err = self.proc.communicate(timeout=timeout)
+        finally:
+            # The files opened for input, output and error are only needed by the subprocess
+            self._close()
+        self._done = True
+
+        rc = self.executable.returncode = self.proc.returncode
+        if metrics.enabled():
+            exe_name = os.path.basename(self.cmd[0])
+            _SUBPROCESSES.inc(exe=exe_name)
+            _SUBPROCESS_SECONDS.observe(time.perf_counter() - self._start, exe=exe_name)
+            if rc != 0:
+                _SUBPROCESS_FAILURES.inc(exe=exe_name)
+
+        result = None
+        if output in (str, str.split) or error in (str, str.split):
+            result = ""
+            if output in (str, str.split):
+                outstr = str(out.decode("utf-8"))
+                result += outstr
+                if output is str.split:
+                    sys.stdout.write(outstr)
+            if error in (str, str.split):
+                errstr = str(err.decode("utf-8"))
+                result += errstr
+                if error is str.split:
+                    sys.stderr.write(errstr)
+        self.result = result
+
+        if self._fail_on_error and self.failed():
+            long_msg = self.cmd_line_string
+            if result:
+                # If the output is not captured in the result, it will have
+                # been stored either in the specified files (e.g. if
+                # 'output' specifies a file) or written to the parent's
+                # stdout/stderr (e.g. if 'output' is not specified)
+                long_msg += "\n" + result
+
+            raise ProcessError(f"Command exited with status {rc}:", long_msg)
+
+        return result
+
+    def terminate(self) -> None:
+        """
+        Terminate the subprocess (if it is still running).
+        """
+        if self.proc.poll() is None:
+            self.proc.terminate()
+
+    def _close(self) -> None:
+        for stream in self._streams:
+            stream.close()
+        self._streams = []
+
+    def __repr__(self):
+        return f"<process {self.proc.pid}: {self.cmd_line_string} (returncode {self.proc.returncode})>"
+
+
+class ExecutablePool:
+    """
+    Run many commands concurrently, at most ``max_workers`` at a time.
+
+    Example:
+    --------
+
+    >>> pool = ExecutablePool(max_workers=8)
+    >>> for mem in range(1, 81):
+    ...     pool.submit(Executable('my_script.py'), f'mem{mem:03d}',
+    ...                 output=f'stdout.mem{mem:03d}', error=f'stderr.mem{mem:03d}')
+    >>> processes = pool.run()  # raises a ProcessError if a command failed
+    """
+
+    def __init__(self, max_workers: int = None, fail_fast: bool = True, poll_interval: float = 0.05):
+        """
+        Construct a pool of commands.
+
+        Parameters
+        ----------
+        max_workers : int
+            maximum number of commands running at a time, default: the number of cpus available
+        fail_fast : bool
+            if True, the running commands are terminated and no other command is started once a command failed,
+            otherwise all the commands are run. In both cases, a ProcessError is raised by ``run()`` if any failed
+        poll_interval : float
+            seconds between checks of the running commands
+        """
+        if max_workers is None:
+            max_workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, not {max_workers}")
+        self.max_workers = max_workers
+        self.fail_fast = fail_fast
+        self.poll_interval = poll_interval
+        self._commands = []
+
+    def submit(self, executable: Executable, *args, **kwargs) -> None:
+        """
+        Add a command to run: ``executable(*args, **kwargs)`` (see ``Executable.__call__``).
+        Output and error are best sent to files for each command (e.g. output='stdout.1', error='stderr.1').
+        They cannot be captured (``str``, ``str.split`` or ``subprocess.PIPE``): the pool does not read
+        the pipes while the commands run, so a command filling its pipe would never complete.
+        """
+        for stream in ('output', 'error'):
+            if kwargs.get(stream) in (str, str.split, subprocess.PIPE):
+                raise ValueError(f"{stream} of the commands of an ExecutablePool cannot be captured, send it to a file")
+        self._commands.append((executable, args, kwargs))
+
+    def run(self) -> List[ExecutableProcess]:
+        """
+        Run the submitted commands, and wait for them to complete.
+
+        Returns:
+        --------
+        List[ExecutableProcess] : the processes of the commands, in the order they were submitted
+
+        Raises:
+        -------
+        ProcessError if any command failed
+        """
+        commands, self._commands = self._commands, []
+        processes = [None] * len(commands)
+        running = []
+        failures = []
+        next_index = 0
+        try:
+            while next_index < len(commands) or running:
+                # Start commands up to max_workers (none once a command failed if fail_fast)
+                while next_index < len(commands) and len(running) < self.max_workers and not (self.fail_fast and failures):
+                    executable, args, kwargs = commands[next_index]
+                    processes[next_index] = executable.start(*args, **kwargs)
+                    running.append(processes[next_index])
+                    next_index += 1
+                if self.fail_fast and failures:
+                    break
+
+                completed = [process for process in running if process.poll() is not None]
+                if not completed:
+                    time.sleep(self.poll_interval)
+                for process in completed:
+                    running.remove(process)
+                    try:
+                        process.wait()
+                    except ProcessError as exc:
+                        failures.append(exc)
+        finally:
+            # Terminate the commands still running (after a failure or an exception)
+            for process in running:
+                process.terminate()
+            for process in running:
+                try:
+                    process.wait()
+                except ProcessError:
+                    pass
+
+        if failures:
+            raise ProcessError(f"{len(failures)} of {len(commands)} commands failed",
+                               "\n".join(f"{exc.short_msg} {exc.long_msg}" for exc in failures))
+        return processes
+
+
 def which_string(*args, **kwargs) -> str:
     """
     Like ``which()``, but return a string instead of an ``Executable``.
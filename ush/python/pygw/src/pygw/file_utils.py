@@ -1,7 +1,15 @@
+import os
+
+from . import metrics
 from .fsutils import cp, mkdir
+from .tracing import span
 
 __all__ = ['FileHandler']
 
+_FILES_COPIED = metrics.counter('pygw_files_copied_total', 'Files copied by pygw.FileHandler')
+_BYTES_COPIED = metrics.counter('pygw_bytes_copied_total', 'Bytes copied by pygw.FileHandler')
+_DIRS_CREATED = metrics.counter('pygw_directories_created_total', 'Directories created by pygw.FileHandler')
+
 
 class FileHandler:
     """Class to manipulate files in bulk for a given configuration
@@ -36,7 +44,8 @@ class FileHandler:
         }
         # loop through the configuration keys
         for action, files in self.config.items():
-            sync_factory[action](files)
+            with span(f'FileHandler.{action}', count=len(files)):
+                sync_factory[action](files)
 
     @staticmethod
     def _copy_files(filelist):
@@ -58,6 +67,9 @@ class FileHandler:
             dest = sublist[1]
             cp(src, dest)
             print(f'Copied {src} to {dest}')  # TODO use logger
+            if metrics.enabled():
+                _FILES_COPIED.inc()
+                _BYTES_COPIED.inc(os.path.getsize(src))
 
     @staticmethod
     def _make_dirs(dirlist):
@@ -71,3 +83,4 @@ class FileHandler:
         for dd in dirlist:
             mkdir(dd)
             print(f'Created {dd}')  # TODO use logger
+            _DIRS_CREATED.inc()
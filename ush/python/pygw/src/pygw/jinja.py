@@ -4,11 +4,15 @@ import sys
 import jinja2
 from markupsafe import Markup
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Union
 
 from .timetools import strftime, to_YMDH, to_YMD, to_fv3time, to_isotime, to_julian
 
-__all__ = ['Jinja']
+__all__ = ['Jinja', 'BundleLoader']
+
+# Process-wide jinja2 environments (see Jinja.get_env), and compiled templates from strings
+_ENVIRONMENTS = dict()
+_STREAM_TEMPLATES = jinja2.utils.LRUCache(400)
 
 
 @jinja2.pass_eval_context
@@ -46,7 +50,8 @@ class Jinja:
     A wrapper around jinja2 to render templates
     """
 
-    def __init__(self, template_path_or_string: str, data: Dict, allow_missing: bool = True):
+    def __init__(self, template_path_or_string: str, data: Dict, allow_missing: bool = True,
+                 cache_dir: Union[str, Path] = None, bundle: Union[str, Path] = None):
         """
         Description
         -----------
@@ -61,10 +66,20 @@ class Jinja:
             Data to be substituted into the template
         allow_missing : bool
             If True, allow for missing or undefined variables
+        cache_dir : str or Path
+            Directory for a jinja2.FileSystemBytecodeCache of the compiled file templates,
+            shared across processes
+            default: environment variable PYGW_JINJA_CACHE_DIR, or no bytecode cache
+        bundle : str or Path
+            Directory or zip file of precompiled file templates (see Jinja.compile_bundle),
+            used for the templates that are not newer than the bundle
+            default: environment variable PYGW_JINJA_BUNDLE, or no bundle
         """
 
         self.data = data
         self.undefined = SilentUndefined if allow_missing else jinja2.StrictUndefined
+        self.cache_dir = cache_dir or os.environ.get('PYGW_JINJA_CACHE_DIR')
+        self.bundle = bundle or os.environ.get('PYGW_JINJA_BUNDLE')
 
         if os.path.isfile(template_path_or_string):
             self.template_type = 'file'
@@ -108,7 +123,11 @@ class Jinja:
         -------
         env: jinja2.Environment
         """
-        env = jinja2.Environment(loader=loader, undefined=self.undefined)
+        bytecode_cache = None
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(str(self.cache_dir))
+        env = jinja2.Environment(loader=loader, undefined=self.undefined, bytecode_cache=bytecode_cache)
         env.filters["strftime"] = lambda dt, fmt: strftime(dt, fmt)
         env.filters["to_isotime"] = lambda dt: to_isotime(dt) if not isinstance(dt, SilentUndefined) else dt
         env.filters["to_fv3time"] = lambda dt: to_fv3time(dt) if not isinstance(dt, SilentUndefined) else dt
@@ -117,6 +136,64 @@ class Jinja:
         env.filters["to_julian"] = lambda dt: to_julian(dt) if not isinstance(dt, SilentUndefined) else dt
         return env
 
+    def get_env(self, searchpath: Union[str, Path] = None) -> jinja2.Environment:
+        """
+        Description
+        -----------
+        Return the process-wide environment for templates in `searchpath`
+        (or for templates from strings if None), creating it if needed.
+        An environment keeps the templates it compiled, so each template is
+        only compiled once per process (and reloaded if it changes on disk)
+
+        Parameters
+        ----------
+        searchpath: str or Path (optional)
+        Returns
+        -------
+        env: jinja2.Environment
+        """
+        key = (None if searchpath is None else str(searchpath), self.undefined,
+               None if self.cache_dir is None else str(self.cache_dir),
+               None if self.bundle is None else str(self.bundle))
+        env = _ENVIRONMENTS.get(key)
+        if env is None:
+            if searchpath is None:
+                loader = jinja2.BaseLoader()
+            elif self.bundle is None or not os.path.exists(self.bundle):
+                loader = jinja2.FileSystemLoader(searchpath)
+            else:
+                loader = jinja2.ChoiceLoader([BundleLoader(self.bundle, searchpath),
+                                              jinja2.FileSystemLoader(searchpath)])
+            env = _ENVIRONMENTS.setdefault(key, self.get_set_env(loader))
+        return env
+
+    @classmethod
+    def compile_bundle(cls, template_dirs: List[Union[str, Path]], target: Union[str, Path],
+                       extensions: List[str] = None, zip: str = 'deflated') -> None:
+        """
+        Description
+        -----------
+        Compile the templates found under `template_dirs` into a bundle `target`,
+        for use with the bundle argument or the environment variable PYGW_JINJA_BUNDLE.
+        The templates are stored by their real path, which must be the same when they are rendered.
+        Files that are not valid templates are skipped.
+
+        Parameters
+        ----------
+        template_dirs: list of str or Path
+            Directories searched (recursively) for templates
+        target: str or Path
+            Path of the bundle, a zip file (or a directory if zip is None)
+        extensions: list of str (optional)
+            Extensions of the templates
+            default: .yaml, .yml, .j2, .jinja, .jinja2
+        zip: str (optional)
+            'deflated' or 'stored' for a zip file, None for a directory
+        """
+        extensions = extensions or ['yaml', 'yml', 'j2', 'jinja', 'jinja2']
+        env = cls('', {}).get_set_env(_FilesLoader(template_dirs))
+        env.compile_templates(str(target), extensions=extensions, zip=zip)
+
     @staticmethod
     def add_filter_env(env: jinja2.Environment, filter_name: str, filter_func: callable):
         """
@@ -143,17 +220,18 @@ class Jinja:
         # return env
 
     def _render_stream(self):
-        loader = jinja2.BaseLoader()
-        env = self.get_set_env(loader)
-        template = env.from_string(self.template_stream)
+        env = self.get_env()
+        key = (id(env), self.template_stream)
+        template = _STREAM_TEMPLATES.get(key)
+        if template is None:
+            template = _STREAM_TEMPLATES[key] = env.from_string(self.template_stream)
         return self._render_template(template)
 
     def _render_file(self, data: Dict = None):
         template_dir = self.template_path.parent
         template_file = self.template_path.relative_to(template_dir)
 
-        loader = jinja2.FileSystemLoader(template_dir)
-        env = self.get_set_env(loader)
+        env = self.get_env(template_dir)
         template = env.get_template(str(template_file))
         return self._render_template(template)
 
@@ -227,3 +305,54 @@ class Jinja:
         """
         io.TextIOWrapper(sys.stdout.buffer,
                          encoding="utf-8").write(self.render)
+
+
+class _FilesLoader(jinja2.BaseLoader):
+    """
+    Loader of the files under a list of directories, by real path (see Jinja.compile_bundle)
+    """
+
+    def __init__(self, template_dirs: List[Union[str, Path]]):
+        self.template_dirs = template_dirs
+
+    def get_source(self, environment: jinja2.Environment, template: str):
+        try:
+            with open(template, 'r') as fh:
+                return fh.read(), template, None
+        except (OSError, UnicodeDecodeError):
+            raise jinja2.TemplateNotFound(template)
+
+    def list_templates(self) -> List[str]:
+        templates = set()
+        for template_dir in self.template_dirs:
+            for root, _, files in os.walk(template_dir, followlinks=True):
+                templates.update(os.path.realpath(os.path.join(root, file)) for file in files)
+        return sorted(templates)
+
+
+class BundleLoader(jinja2.ModuleLoader):
+    """
+    Loader of the templates in `searchpath` from a bundle compiled by Jinja.compile_bundle
+    Templates modified after the bundle was compiled are not found, so that a
+    jinja2.ChoiceLoader falls back on compiling them from their source
+    """
+
+    def __init__(self, bundle: Union[str, Path], searchpath: Union[str, Path]):
+        super().__init__(str(bundle))
+        self.searchpath = searchpath
+        self.bundle_mtime = os.path.getmtime(bundle)
+
+    def load(self, environment: jinja2.Environment, name: str, globals=None) -> jinja2.Template:
+        path = os.path.realpath(os.path.join(self.searchpath, name))
+        if not self._uptodate(path):
+            raise jinja2.TemplateNotFound(name)
+        template = super().load(environment, path, globals)
+        # Reload the template from its source when it is modified
+        template._uptodate = lambda: self._uptodate(path)
+        return template
+
+    def _uptodate(self, path: str) -> bool:
+        try:
+            return os.path.getmtime(path) <= self.bundle_mtime
+        except OSError:
+            return False
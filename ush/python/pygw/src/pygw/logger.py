@@ -4,11 +4,26 @@ Logger
 
 import os
 import sys
+import time
+import atexit
+import queue
+import threading
+import logging.handlers
+from collections import namedtuple
 from functools import wraps
 from pathlib import Path
-from typing import Union, List
+from typing import Union, List, Dict
 import logging
 
+__all__ = ['Logger', 'logit', 'CallStats', 'call_stats', 'call_stats_clear', 'call_profile_report']
+
+# Process-wide timings of the calls of the functions decorated with logit:
+# {function: [calls, wall-clock total, wall-clock max, cpu total, cpu max]}
+_CALL_STATS = dict()
+_CALL_STATS_LOCK = threading.Lock()
+
+CallStats = namedtuple('CallStats', ['calls', 'total', 'max', 'cpu_total', 'cpu_max'])
+
 
 class ColoredFormatter(logging.Formatter):
     """
@@ -52,7 +67,8 @@ class Logger:
                  level: str = os.environ.get("LOGGING_LEVEL"),
                  _format: str = DEFAULT_FORMAT,
                  colored_log: bool = False,
-                 logfile_path: Union[str, Path] = None):
+                 logfile_path: Union[str, Path] = None,
+                 use_queue: bool = False):
         """
         Initialize Logger
 
@@ -73,6 +89,10 @@ class Logger:
         logfile_path : str or Path
                        Path for logging to a file
                        default : None
+        use_queue    : bool
+                       Format and write the records in a background thread,
+                       the records are queued by the calling thread
+                       default : False
         """
 
         self.name = name
@@ -98,15 +118,25 @@ class Logger:
             colored_log=self.colored_log,
         )
         _handlers.append(_handler)
-        self._logger.addHandler(_handler)
 
         # Add file handler for logger
         if logfile_path is not None:
             _handler = Logger.add_file_handler(
                 logfile_path, level=self.level, _format=self.format)
-            self._logger.addHandler(_handler)
             _handlers.append(_handler)
 
+        self._handlers = _handlers
+        self._listener = None
+        if use_queue:
+            # The records are handled by the listener thread, which is stopped (after handling
+            # all the queued records) at exit, even if exiting on an exception
+            _queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(_queue, *_handlers, respect_handler_level=True)
+            self._listener.start()
+            atexit.register(self._listener.stop)
+            _handlers = [logging.handlers.QueueHandler(_queue)]
+        Logger.add_handlers(self._logger, _handlers)
+
     def __getattr__(self, attribute):
         """
         Allows calling logging module methods directly
@@ -122,6 +152,16 @@ class Logger:
         """
         return getattr(self._logger, attribute)
 
+    def flush(self):
+        """
+        Handle all the queued records (if use_queue) and flush the handlers
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener.start()
+        for handler in self._handlers:
+            handler.flush()
+
     def get_logger(self):
         """
         Return the logging object
@@ -233,6 +273,9 @@ def logit(logger, name=None, message=None):
     Logger decorator to add logging to a function.
     Simply add:
     @logit(logger) before any function
+    The arguments and the return value are only represented when logging at the DEBUG level.
+    The wall-clock and cpu times of the calls are recorded (see call_stats), and reported at exit
+    in the file ${PYGW_CALL_PROFILE} if set.
     Parameters
     ----------
     logger  : Logger
@@ -253,23 +296,94 @@ def logit(logger, name=None, message=None):
         @wraps(func)
         def wrapper(*args, **kwargs):
 
-            passed_args = [repr(aa) for aa in args]
-            passed_kwargs = [f"{kk}={repr(vv)}" for kk, vv in list(kwargs.items())]
+            # Only represent the arguments if they are going to be logged
+            debug = logger.isEnabledFor(logging.DEBUG)
 
             call_msg = 'BEGIN: ' + log_msg
             logger.info(call_msg)
-            logger.debug(f"( {', '.join(passed_args + passed_kwargs)} )")
+            if debug:
+                passed_args = [repr(aa) for aa in args]
+                passed_kwargs = [f"{kk}={repr(vv)}" for kk, vv in list(kwargs.items())]
+                logger.debug(f"( {', '.join(passed_args + passed_kwargs)} )")
 
             # Call the function
-            retval = func(*args, **kwargs)
+            start, cpu_start = time.perf_counter(), time.process_time()
+            try:
+                retval = func(*args, **kwargs)
+            finally:
+                _record_call(log_msg, time.perf_counter() - start, time.process_time() - cpu_start)
 
             # Close the logging with printing the return val
             ret_msg = '  END: ' + log_msg
             logger.info(ret_msg)
-            logger.debug(f" returning: {retval}")
+            if debug:
+                logger.debug(f" returning: {retval}")
 
             return retval
 
         return wrapper
 
     return decorate
+
+
+def _record_call(function: str, elapsed: float, cpu: float) -> None:
+    with _CALL_STATS_LOCK:
+        stats = _CALL_STATS.get(function)
+        if stats is None:
+            _CALL_STATS[function] = [1, elapsed, elapsed, cpu, cpu]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += cpu
+            stats[4] = max(stats[4], cpu)
+
+
+def call_stats() -> Dict[str, CallStats]:
+    """
+    Timings (in seconds) of the calls of the functions decorated with logit in this process,
+    by function: number of calls, total and max wall-clock time, total and max cpu time
+    """
+    with _CALL_STATS_LOCK:
+        return {function: CallStats(*stats) for function, stats in _CALL_STATS.items()}
+
+
+def call_stats_clear() -> None:
+    """
+    Clear the timings of the calls of the functions decorated with logit
+    """
+    with _CALL_STATS_LOCK:
+        _CALL_STATS.clear()
+
+
+def call_profile_report() -> str:
+    """
+    Report of the timings of the calls of the functions decorated with logit,
+    by decreasing total wall-clock time
+    """
+    stats = sorted(call_stats().items(), key=lambda item: item[1].total, reverse=True)
+    width = max([len('function')] + [len(function) for function, _ in stats])
+    lines = [f"{'function':<{width}}  {'calls':>8}  {'total':>10}  {'max':>10}  {'cpu_total':>10}  {'cpu_max':>10}"]
+    for function, stat in stats:
+        lines.append(f"{function:<{width}}  {stat.calls:>8d}  {stat.total:>10.3f}  {stat.max:>10.3f}  "
+                     f"{stat.cpu_total:>10.3f}  {stat.cpu_max:>10.3f}")
+    return '\n'.join(lines) + '\n'
+
+
+def _write_call_profile(path: str) -> None:
+    """
+    Append the report of the timings of the calls of this process to the file path
+    """
+    if not _CALL_STATS:
+        return
+    try:
+        with open(path, 'a') as fh:
+            fh.write(f"# {' '.join(sys.argv)} (pid {os.getpid()})\n")
+            fh.write(call_profile_report())
+    except OSError as exc:
+        print(f"unable to write the call profile to {path}: {exc}", file=sys.stderr)
+
+
+# Write the report of the timings of the calls at exit if PYGW_CALL_PROFILE is the path of a file
+if os.environ.get('PYGW_CALL_PROFILE'):
+    atexit.register(_write_call_profile, os.path.abspath(os.environ['PYGW_CALL_PROFILE']))
@@ -0,0 +1,279 @@
+"""
+Metrics (counters, gauges and histograms) of the python jobs
+
+The metrics are only recorded when enabled, by ${PYGW_METRICS_DIR} (or enable()), the directory to which
+they are exported, at the end of each phase of a task (see pygw.task.Task), as a Prometheus textfile
+(e.g. for the textfile collector of the node exporter) and as JSON.
+When disabled, updating a metric returns immediately.
+"""
+
+import os
+import json
+import threading
+from typing import Dict, List, Any, Union, Tuple
+from pathlib import Path
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'counter', 'gauge', 'histogram',
+           'enable', 'disable', 'enabled', 'get_metrics_dir', 'reset',
+           'to_prometheus', 'to_json', 'export']
+
+_STATE = {'dir': os.environ.get('PYGW_METRICS_DIR') or None}
+_REGISTRY = dict()
+_LOCK = threading.Lock()
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1., 5., 10., 30., 60., 300., 600., 1800., 3600.)
+
+
+def enable(directory: Union[str, Path]) -> None:
+    """
+    Record the metrics, exported to directory
+    """
+    _STATE['dir'] = os.path.abspath(directory)
+
+
+def disable() -> None:
+    """
+    Stop recording the metrics
+    """
+    _STATE['dir'] = None
+
+
+def enabled() -> bool:
+    """
+    True if the metrics are recorded
+    """
+    return _STATE['dir'] is not None
+
+
+def get_metrics_dir() -> Union[str, None]:
+    """
+    Directory to which the metrics are exported, None if they are not recorded
+    """
+    return _STATE['dir']
+
+
+def _labels_key(labels: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class _Metric:
+    """
+    A metric: its values by labels (e.g. counter.inc(task='atmanlinit'))
+    """
+    TYPE = None
+
+    def __init__(self, name: str, description: str = ''):
+        self.name = name
+        self.description = description
+        self._values = dict()
+
+    def samples(self) -> List[Tuple[Dict[str, str], Any]]:
+        """
+        The (labels, value) of the metric
+        """
+        with _LOCK:
+            return [(dict(key), self._copy(value)) for key, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def clear(self) -> None:
+        with _LOCK:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """
+    A value that only increases (e.g. the number of files copied)
+    """
+    TYPE = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if _STATE['dir'] is None:
+            return
+        if amount < 0:
+            raise ValueError(f"counter {self.name} can only increase")
+        key = _labels_key(labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that may increase or decrease (e.g. the size of a cache)
+    """
+    TYPE = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        if _STATE['dir'] is None:
+            return
+        key = _labels_key(labels)
+        with _LOCK:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if _STATE['dir'] is None:
+            return
+        key = _labels_key(labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """
+    The distribution of observed values (e.g. durations) in buckets
+    """
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, description: str = '', buckets: List[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        if _STATE['dir'] is None:
+            return
+        key = _labels_key(labels)
+        with _LOCK:
+            observed = self._values.get(key)
+            if observed is None:
+                observed = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0., 'count': 0}
+            for ii, bound in enumerate(self.buckets):
+                if value <= bound:
+                    observed['buckets'][ii] += 1
+                    break
+            observed['sum'] += value
+            observed['count'] += 1
+
+    @staticmethod
+    def _copy(value):
+        return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+
+
+def _register(cls, name: str, *args, **kwargs) -> _Metric:
+    with _LOCK:
+        metric = _REGISTRY.get(name)
+        if metric is None:
+            metric = _REGISTRY[name] = cls(name, *args, **kwargs)
+    if not isinstance(metric, cls):
+        raise ValueError(f"metric {name} is already registered as a {metric.TYPE}")
+    return metric
+
+
+def counter(name: str, description: str = '') -> Counter:
+    """
+    The counter name of the registry (created if needed)
+    """
+    return _register(Counter, name, description)
+
+
+def gauge(name: str, description: str = '') -> Gauge:
+    """
+    The gauge name of the registry (created if needed)
+    """
+    return _register(Gauge, name, description)
+
+
+def histogram(name: str, description: str = '', buckets: List[float] = DEFAULT_BUCKETS) -> Histogram:
+    """
+    The histogram name of the registry (created if needed)
+    """
+    return _register(Histogram, name, description, buckets=buckets)
+
+
+def reset() -> None:
+    """
+    Clear the values of all the metrics of the registry
+    """
+    for metric in list(_REGISTRY.values()):
+        metric.clear()
+
+
+def _format_labels(labels: Dict[str, str], **extra) -> str:
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    escaped = {key: value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for key, value in labels.items()}
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped.items()) + '}'
+
+
+def to_prometheus() -> str:
+    """
+    The metrics of the registry in the Prometheus text format
+    """
+    lines = []
+    for name, metric in sorted(_REGISTRY.items()):
+        samples = metric.samples()
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {metric.description}")
+        lines.append(f"# TYPE {name} {metric.TYPE}")
+        for labels, value in samples:
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value['buckets']):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=repr(float(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def to_json() -> Dict[str, Any]:
+    """
+    The metrics of the registry as a dictionary (serializable to JSON)
+    """
+    metrics = dict()
+    for name, metric in sorted(_REGISTRY.items()):
+        samples = metric.samples()
+        if not samples:
+            continue
+        metrics[name] = {'type': metric.TYPE,
+                         'help': metric.description,
+                         'samples': [{'labels': labels, 'value': value} for labels, value in samples]}
+        if isinstance(metric, Histogram):
+            metrics[name]['buckets'] = metric.buckets
+    return metrics
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """
+    Write text to path through a temporary file, so path is never read partially written
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as fh:
+        fh.write(text)
+    os.replace(tmp_path, path)
+
+
+def export(name: str, directory: Union[str, Path] = None) -> Union[List[str], None]:
+    """
+    Write the metrics of the registry to directory/name.prom and directory/name.json
+
+    Parameters
+    ----------
+    name : str
+        name of the files (e.g. the task and its cycle)
+    directory : str or Path, optional
+        default: the directory of the metrics (${PYGW_METRICS_DIR})
+
+    Returns
+    -------
+    list of str or None
+        paths of the files written, None if the metrics are not recorded
+    """
+    directory = directory or _STATE['dir']
+    if directory is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    prom_path = os.path.join(directory, f"{name}.prom")
+    json_path = os.path.join(directory, f"{name}.json")
+    _write_atomic(prom_path, to_prometheus())
+    _write_atomic(json_path, json.dumps(to_json(), indent=2) + '\n')
+    return [prom_path, json_path]
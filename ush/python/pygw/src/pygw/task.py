@@ -1,17 +1,36 @@
+import os
 import logging
+from functools import wraps
 from typing import Dict
 
-from pygw.attrdict import AttrDict
-from pygw.timetools import add_to_datetime, to_timedelta
+from pygw import metrics, tracing
+from pygw.attrdict import AttrDict, LayeredAttrDict
+from pygw.timetools import add_to_datetime, to_timedelta, datetime_to_YMDH
 
 logger = logging.getLogger(__name__.split('.')[-1])
 
+_PHASE_SECONDS = metrics.histogram('pygw_task_phase_seconds', 'Run time of the phases of the tasks')
+_PHASE_FAILURES = metrics.counter('pygw_task_phase_failures_total', 'Phases of the tasks ending with an exception')
+
 
 class Task:
     """
     Base class for all tasks
+
+    The phases (initialize, configure, execute, finalize and clean) of the tasks are timed
+    in a span of pygw.tracing, written to the ledger of the cycle (in ROTDIR/logs/YYYYMMDDHH)
+    unless another ledger is set (e.g. by ${PYGW_TRACE_LEDGER}).
+    If ${PYGW_METRICS_DIR} is set, the metrics of pygw.metrics are exported to it at the end of each phase.
     """
 
+    PHASES = ['initialize', 'configure', 'execute', 'finalize', 'clean']
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for phase in Task.PHASES:
+            if phase in cls.__dict__:
+                setattr(cls, phase, _traced_phase(cls.__dict__[phase], phase))
+
     def __init__(self, config: Dict, *args, **kwargs):
         """
         Every task needs a config.
@@ -30,7 +49,7 @@ class Task:
         """
 
         # Store the config and arguments as attributes of the object
-        self.config = AttrDict(config)
+        self.config = LayeredAttrDict(config)
 
         for arg in args:
             setattr(self, str(arg), arg)
@@ -60,6 +79,11 @@ class Task:
         self.runtime_config['previous_cycle'] = add_to_datetime(self.runtime_config.current_cycle, -to_timedelta(f"{self.config['assim_freq']}H"))
         logger.debug(f"previous cycle: {self.runtime_config['previous_cycle']}")
 
+        # Trace the phases of the task in the ledger of the cycle
+        if 'ROTDIR' in self.config:
+            tracing.set_ledger(os.path.join(self.config.ROTDIR, 'logs', datetime_to_YMDH(self.runtime_config.current_cycle),
+                                            tracing.LEDGER_NAME), override=False)
+
         pass
 
     def initialize(self):
@@ -91,3 +115,44 @@ class Task:
         Methods to clean after execution and finalization prior to closing out a task
         """
         pass
+
+
+def _traced_phase(func, phase):
+    """
+    Time the calls of the phase of a task in a span (once, when the phase of a subclass calls the phase of its base class)
+    and export the metrics at the end of the phase
+    """
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        task = type(self).__name__
+        current = tracing.current_span()
+        if current is not None and current.name == phase and current.task == task:
+            return func(self, *args, **kwargs)
+        cycle = datetime_to_YMDH(self.runtime_config.current_cycle)
+        phase_span = tracing.span(phase, task=task, cycle=cycle)
+        try:
+            with phase_span:
+                return func(self, *args, **kwargs)
+        except Exception:
+            _PHASE_FAILURES.inc(task=task, phase=phase)
+            raise
+        finally:
+            _PHASE_SECONDS.observe(phase_span.duration, task=task, phase=phase)
+            if current is None:
+                _export_metrics(f"pygw_{self.runtime_config.RUN}_{task}_{phase}_{cycle}")
+
+    return wrapper
+
+
+def _export_metrics(name: str) -> None:
+    """
+    Export the metrics (exporting does not stop a task, errors are only reported)
+    """
+    try:
+        paths = metrics.export(name)
+    except OSError as exc:
+        logger.warning(f"unable to export the metrics {name}: {exc}")
+    else:
+        if paths:
+            logger.debug(f"exported the metrics to {', '.join(paths)}")
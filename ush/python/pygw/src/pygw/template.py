@@ -1,12 +1,13 @@
 import re
 import os
 import copy
+from functools import lru_cache
 from collections import namedtuple
 from collections.abc import Sequence
 
 # Template imported with permission from jcsda/solo
 
-__all__ = ['Template', 'TemplateConstants']
+__all__ = ['Template', 'TemplateConstants', 'TemplateProgram', 'TemplateCycleError']
 
 
 class TemplateConstants:
@@ -19,6 +20,15 @@ class TemplateConstants:
     SubPair = namedtuple('SubPair', ['regex', 'slice'])
 
 
+class TemplateCycleError(Exception):
+    """
+        Raised when variables refer to each other in a cycle (e.g. a: $(b) and b: $(a))
+    """
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__('variables refer to each other in a cycle: ' + ' -> '.join(cycle))
+
+
 class Template:
 
     """
@@ -68,32 +78,42 @@ class Template:
         pair = cls.substitutions[var_type]
         if isinstance(variable_to_substitute, str):
             variable_names = re.findall(pair.regex, variable_to_substitute)
-            for variable in variable_names:
-                var = variable[pair.slice]
-                v = get_value(var)
-                if v is not None:
-                    if not is_single_type_or_string(v):
-                        if len(variable_names) == 1:
-                            # v could be a list or a dictionary (complex structure and not a string).
-                            # If there is one variable that is the whole
-                            # string, we can safely replace, otherwise do nothing.
-                            if variable_to_substitute.replace(variable_names[0][pair.slice], '') == var_type:
-                                variable_to_substitute = v
-                    else:
-                        if isinstance(v, float) or isinstance(v, int):
-                            v = str(v)
-                        if isinstance(v, str):
-                            variable_to_substitute = variable_to_substitute.replace(
-                                variable, v)
-                        else:
+            variable_to_substitute = cls._substitute_variables(variable_to_substitute, variable_names, var_type, get_value)
+        return variable_to_substitute
+
+    @classmethod
+    def _substitute_variables(cls, variable_to_substitute: str, variable_names, var_type: str, get_value):
+        """
+            Substitutes the variables variable_names (as found by the regex of var_type)
+            of the string variable_to_substitute, see substitute_string
+        """
+        pair = cls.substitutions[var_type]
+        for variable in variable_names:
+            var = variable[pair.slice]
+            v = get_value(var)
+            if v is not None:
+                if not is_single_type_or_string(v):
+                    if len(variable_names) == 1:
+                        # v could be a list or a dictionary (complex structure and not a string).
+                        # If there is one variable that is the whole
+                        # string, we can safely replace, otherwise do nothing.
+                        if variable_to_substitute.replace(variable_names[0][pair.slice], '') == var_type:
                             variable_to_substitute = v
                 else:
-                    more = re.search(pair.regex, var)
-                    if more is not None:
-                        new_value = cls.substitute_string(
-                            var, var_type, get_value)
+                    if isinstance(v, float) or isinstance(v, int):
+                        v = str(v)
+                    if isinstance(v, str):
                         variable_to_substitute = variable_to_substitute.replace(
-                            var, new_value)
+                            variable, v)
+                    else:
+                        variable_to_substitute = v
+            else:
+                more = re.search(pair.regex, var)
+                if more is not None:
+                    new_value = cls.substitute_string(
+                        var, var_type, get_value)
+                    variable_to_substitute = variable_to_substitute.replace(
+                        var, new_value)
         return variable_to_substitute
 
     @classmethod
@@ -115,6 +135,123 @@ class Template:
                                                             get_value)
         return structure_to_substitute
 
+    @classmethod
+    def substitute_styles(cls, structure_to_substitute, get_values):
+        """
+            Substitutes the variables of several types at once, get_values being a dictionary
+            {var_type: get_value} (e.g. {TemplateConstants.DOLLAR_CURLY_BRACE: os.environ.get,
+            TemplateConstants.DOLLAR_PARENTHESES: my_dict.get}).
+            structure_to_substitute (a string or a complex dictionary, substituted in place as in
+            substitute_structure) is scanned once with a single regex matching all the var_types.
+            Returns the substituted structure and the list of the variables that were not substituted
+            (e.g. ['$(unknown)']), in the order they were found.
+        """
+        var_types = tuple(get_values)
+        regex = cls._combined_regex(var_types)
+        unresolved = {}
+
+        def substitute(item):
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    item[key] = substitute(value)
+            elif is_sequence_and_not_string(item):
+                for i, value in enumerate(item):
+                    item[i] = substitute(value)
+            elif isinstance(item, str):
+                item = cls._substitute_matches(item, regex, var_types, get_values, unresolved)
+            return item
+
+        return substitute(structure_to_substitute), list(unresolved)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _combined_regex(cls, var_types):
+        """
+            A single regex matching the variables of all var_types, var_types[i] being matched by group 'v<i>'
+        """
+        return re.compile('|'.join(f'(?P<v{i}>{cls.substitutions[var_type].regex.pattern})'
+                                   for i, var_type in enumerate(var_types)))
+
+    @classmethod
+    def _substitute_matches(cls, string, regex, var_types, get_values, unresolved):
+        """
+            Substitutes the variables matched by regex (see _combined_regex) in string, following the rules
+            of substitute_string, and records the variables that were not substituted in unresolved
+        """
+        matches = list(regex.finditer(string))
+        if not matches:
+            return string
+        if len(matches) == 1 and matches[0].group() == string:
+            # string is a single variable, which may be substituted by any value (even a complex structure)
+            value = cls._match_value(matches[0], regex, var_types, get_values, unresolved)
+            if isinstance(value, (float, int)):
+                value = str(value)
+            return string if value is None else value
+
+        pieces = []
+        end = 0
+        for match in matches:
+            pieces.append(string[end:match.start()])
+            value = cls._match_value(match, regex, var_types, get_values, unresolved)
+            if value is None or not is_single_type_or_string(value):
+                value = match.group()
+            elif not isinstance(value, str):
+                value = str(value)
+            pieces.append(value)
+            end = match.end()
+        pieces.append(string[end:])
+        return ''.join(pieces)
+
+    @classmethod
+    def _match_value(cls, match, regex, var_types, get_values, unresolved):
+        """
+            The value of the variable of match, None if not found
+        """
+        var_type = var_types[int(match.lastgroup[1:])]
+        variable = match.group()
+        pair = cls.substitutions[var_type]
+        value = get_values[var_type](variable[pair.slice])
+        if value is not None:
+            return value
+        # The variable may be made of other variables, e.g. $(${VAR})
+        name = variable[pair.slice]
+        new_name = cls._substitute_matches(name, regex, var_types, get_values, unresolved)
+        if isinstance(new_name, str) and new_name != name:
+            variable = variable.replace(name, new_name)
+        unresolved[variable] = None
+        return variable if variable != match.group() else None
+
+    @classmethod
+    def compile(cls, structure, var_type: str):
+        """
+            Scans structure (a string or a complex dictionary) once for the variables of var_type and
+            returns a TemplateProgram that substitutes them, for rendering the same structure with
+            different values (e.g. TemplateProgram.render(my_dict.get)).
+        """
+        pair = cls.substitutions[var_type]
+
+        def scan(item):
+            if isinstance(item, dict):
+                tree = {key: scan(value) for key, value in item.items()}
+                return {key: subtree for key, subtree in tree.items() if subtree is not None} or None
+            elif is_sequence_and_not_string(item):
+                tree = {index: scan(value) for index, value in enumerate(item)}
+                return {index: subtree for index, subtree in tree.items() if subtree is not None} or None
+            elif isinstance(item, str):
+                return re.findall(pair.regex, item) or None
+            return None
+
+        return TemplateProgram(structure, var_type, scan(structure))
+
+    @classmethod
+    def render_many(cls, structure, var_type: str, contexts):
+        """
+            Substitutes the variables of structure with the values of each dictionary of contexts,
+            scanning structure only once (see compile), and returns the list of the results.
+        """
+        program = cls.compile(structure, var_type)
+        return [program.render(context.get) for context in contexts]
+
     @classmethod
     def substitute_structure_from_environment(cls, structure_to_substitute):
         return cls.substitute_structure(structure_to_substitute, TemplateConstants.DOLLAR_CURLY_BRACE, os.environ.get)
@@ -124,18 +261,51 @@ class Template:
         """
             Given a dictionary with a complex (deep) structure, we want to substitute variables,
             using keys, another dictionary that may also have a deep structure (dictionary and keys
-            can be the same dictionary if you want to substitute in place).
+            can be the same dictionary).
             We create an index based on keys (see build_index) and substitute values in dictionary
-            using index. If variables may refer to other variables, more than one pass of substitution
-            may be needed, so we substitute until there is no more change in dictionary (convergence).
+            using index. Variables may refer to other variables: the value of a variable is resolved
+            (once) before it is substituted, following the references between the variables (depth-first,
+            i.e. in topological order). A TemplateCycleError is raised if variables refer to each other in a cycle.
+            The substituted structure is a new one: neither dictionary nor keys (nor the dictionaries
+            and lists they hold) are modified.
         """
         all_variables = cls.build_index(keys, excluded, shallow_precedence)
-        previous = {}
-        while dictionary != previous:
-            previous = copy.deepcopy(dictionary)
-            dictionary = cls.substitute_structure(
-                dictionary, var_type, all_variables.get)
-        return dictionary
+        pair = cls.substitutions[var_type]
+        resolved = {}
+        resolving = []
+        copies = {}  # id of a structure -> its substituted copy
+
+        def get_value(name):
+            if name not in all_variables:
+                return None
+            if name in resolved:
+                return resolved[name]
+            if name in resolving:
+                raise TemplateCycleError(resolving[resolving.index(name):] + [name])
+            resolving.append(name)
+            resolved[name] = substitute(all_variables[name])
+            resolving.pop()
+            return resolved[name]
+
+        def substitute(item):
+            if isinstance(item, dict) or is_sequence_and_not_string(item):
+                if id(item) in copies:
+                    return copies[id(item)]
+                if isinstance(item, tuple):
+                    copies[id(item)] = type(item)(substitute(value) for value in item)
+                    return copies[id(item)]
+                result = copies[id(item)] = copy.copy(item)
+                for key in (item.keys() if isinstance(item, dict) else range(len(item))):
+                    result[key] = substitute(item[key])
+                return result
+            # Substituting may form new variables out of nested ones (e.g. $($(key))), substitute those too
+            previous = None
+            while isinstance(item, str) and item != previous and re.search(pair.regex, item):
+                previous = item
+                item = cls.substitute_string(item, var_type, get_value)
+            return item
+
+        return substitute(dictionary)
 
     @classmethod
     def build_index(cls, dictionary, excluded=None, shallow_precedence=True):
@@ -164,6 +334,58 @@ class Template:
         return var
 
 
+class TemplateProgram:
+
+    """
+        A structure compiled by Template.compile: the templated strings of the structure and their
+        variables, found once.
+        render(get_value) returns the structure as Template.substitute_structure would, without
+        modifying the structure: only the templated strings and the containers holding them are
+        new objects, the rest of the structure is shared with the result.
+    """
+
+    def __init__(self, structure, var_type: str, tree):
+        self.structure = structure
+        self.var_type = var_type
+        # Nested {key or index: subtree} down to the templated strings, whose leaves are the
+        # variables found in the strings (None if nothing is templated)
+        self._tree = tree
+
+    @property
+    def templated(self) -> bool:
+        """
+            True if the structure has any variable to substitute
+        """
+        return self._tree is not None
+
+    def render(self, get_value):
+        """
+            Substitutes the variables, getting their values from get_value (see Template.substitute_string)
+        """
+        if self._tree is None:
+            return self.structure
+        return self._render(self.structure, self._tree, get_value)
+
+    def _render(self, item, tree, get_value):
+        if isinstance(tree, list):
+            return Template._substitute_variables(item, tree, self.var_type, get_value)
+        if isinstance(item, tuple):
+            item = list(item)
+            for index, subtree in tree.items():
+                item[index] = self._render(item[index], subtree, get_value)
+            return tuple(item)
+        if isinstance(item, dict):
+            # A shallow copy (copy.copy of an AttrDict copies its nested dictionaries as well)
+            new = type(item)()
+            dict.update(new, item)
+            item = new
+        else:
+            item = copy.copy(item)
+        for key, subtree in tree.items():
+            item[key] = self._render(item[key], subtree, get_value)
+        return item
+
+
 # These used to be in basic.py, and have been copied here till they are needed elsewhere.
 
 
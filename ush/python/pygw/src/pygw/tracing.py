@@ -0,0 +1,297 @@
+"""
+Tracing of the time spent in the (nested) steps of a task
+
+Spans time a block of code (`with span('name'):`) or a function (`@traced()`) and are nested
+in the span open when they start. Each span ends as a JSON line in the ledger (see set_ledger),
+and the ledgers of many cycles are summarized (count, p50, p95, max of the durations per task
+and span path) by:
+    python -m pygw.tracing LEDGER_OR_DIRECTORY [LEDGER_OR_DIRECTORY ...]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import itertools
+import contextvars
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Any, Union, Iterable
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+__all__ = ['Span', 'span', 'traced', 'current_span', 'get_ledger', 'set_ledger',
+           'read_ledgers', 'summarize_ledgers', 'LEDGER_NAME']
+
+# Name of the ledger of a cycle (in the log directory of the cycle)
+LEDGER_NAME = 'pygw_trace.jsonl'
+
+# Ledger in which the spans are written (None: spans are not written)
+_LEDGER = {'path': os.environ.get('PYGW_TRACE_LEDGER') or None}
+
+_CURRENT_SPAN = contextvars.ContextVar('pygw_current_span', default=None)
+_SPAN_IDS = itertools.count(1)
+_HOST = socket.gethostname()
+
+
+def get_ledger() -> Union[str, None]:
+    """
+    Path of the ledger in which the spans are written, None if they are not written
+    """
+    return _LEDGER['path']
+
+
+def set_ledger(path: Union[str, Path, None], override: bool = True) -> None:
+    """
+    Set the path of the ledger in which the spans are written (None not to write them)
+
+    Parameters
+    ----------
+    path : str or Path or None
+        path of the ledger (a file of JSON lines, appended to)
+    override : bool
+        if False, only set the ledger if none was set, nor given by ${PYGW_TRACE_LEDGER}
+        (which may be set to an empty string not to write the spans)
+    """
+    if not override and (_LEDGER['path'] is not None or 'PYGW_TRACE_LEDGER' in os.environ):
+        return
+    _LEDGER['path'] = None if path is None else os.path.abspath(path)
+
+
+def current_span() -> Union['Span', None]:
+    """
+    The span open in the current context, None if there is none
+    """
+    return _CURRENT_SPAN.get()
+
+
+class Span:
+    """
+    A timed step of a task, used as a context manager (see span)
+
+    Attributes
+    ----------
+    name : str
+        name of the span
+    path : str
+        names of the enclosing spans and of this span, separated by '/'
+    task : str
+        task of the span (inherited from the enclosing span if not given)
+    attributes : dict
+        additional attributes written in the ledger
+    """
+
+    def __init__(self, name: str, task: str = None, **attributes):
+        self.name = name
+        self.task = task
+        self.attributes = attributes
+        self.span_id = None
+        self.parent = None
+        self.path = name
+        self.start = None
+        self.duration = None
+        self.cpu = None
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        """
+        Add attributes to the span
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> 'Span':
+        self.parent = _CURRENT_SPAN.get()
+        if self.parent is not None:
+            self.path = f"{self.parent.path}/{self.name}"
+            if self.task is None:
+                self.task = self.parent.task
+        self.span_id = f"{os.getpid()}-{next(_SPAN_IDS)}"
+        self._token = _CURRENT_SPAN.set(self)
+        self.start = time.time()
+        self._perf_start, self._cpu_start = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.duration = time.perf_counter() - self._perf_start
+        self.cpu = time.process_time() - self._cpu_start
+        _CURRENT_SPAN.reset(self._token)
+        record = self.to_dict()
+        if exc_type is not None:
+            record.update(status='error', error=f"{exc_type.__name__}: {exc_value}")
+        _write(record)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The record of the span in the ledger
+        """
+        return {'name': self.name,
+                'path': self.path,
+                'task': self.task,
+                'span_id': self.span_id,
+                'parent_id': None if self.parent is None else self.parent.span_id,
+                'pid': os.getpid(),
+                'host': _HOST,
+                'start': self.start,
+                'duration': self.duration,
+                'cpu': self.cpu,
+                'status': 'ok',
+                'attributes': self.attributes}
+
+
+def span(name: str, task: str = None, **attributes) -> Span:
+    """
+    A span timing the block of a with statement:
+        with span('stage fix files', nfiles=len(fix_files)):
+            ...
+
+    Parameters
+    ----------
+    name : str
+        name of the span
+    task : str, optional
+        task of the span, default: the task of the enclosing span
+    **attributes
+        additional attributes of the span (written in the ledger)
+    """
+    return Span(name, task=task, **attributes)
+
+
+def traced(name: str = None, **attributes):
+    """
+    Decorator timing each call of a function in a span
+
+    Parameters
+    ----------
+    name : str, optional
+        name of the span, default: the qualified name of the function
+    **attributes
+        additional attributes of the span (written in the ledger)
+    """
+
+    def decorate(func):
+
+        span_name = name if name else func.__qualname__.split('<locals>.')[-1]
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(span_name, **attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _write(record: Dict[str, Any]) -> None:
+    """
+    Append the record of a span to the ledger (tracing does not stop a task, errors are only reported)
+    """
+    path = _LEDGER['path']
+    if path is None:
+        return
+    line = json.dumps(record, default=str) + '\n'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A single write of the line in append mode, for processes sharing the ledger
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+    except OSError as exc:
+        print(f"unable to write the span {record['path']} to {path}: {exc}", file=sys.stderr)
+
+
+def read_ledgers(paths: Iterable[Union[str, Path]]) -> List[Dict[str, Any]]:
+    """
+    Read the records of the ledgers, directories being searched (recursively) for ledgers named LEDGER_NAME
+
+    Parameters
+    ----------
+    paths : list of str or Path
+        ledgers or directories containing ledgers
+
+    Returns
+    -------
+    list of dict
+        the records of the spans
+    """
+    records = []
+    for path in paths:
+        path = Path(path)
+        ledgers = sorted(path.rglob(LEDGER_NAME)) if path.is_dir() else [path]
+        for ledger in ledgers:
+            with open(ledger, 'r') as fh:
+                records.extend(json.loads(line) for line in fh if line.strip())
+    return records
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """
+    Percentile of sorted values (linear interpolation between the closest ranks)
+    """
+    rank = (len(values) - 1) * percent / 100.
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize_ledgers(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Statistics of the durations of the spans, by task and span path
+
+    Parameters
+    ----------
+    records : list of dict
+        records of the spans (see read_ledgers)
+
+    Returns
+    -------
+    list of dict
+        task, path, count, p50, p95, max and total of the durations (in seconds), by task and path
+    """
+    durations = dict()
+    for record in records:
+        durations.setdefault((record.get('task') or '', record['path']), []).append(record['duration'])
+    summary = []
+    for (task, path), values in sorted(durations.items()):
+        values.sort()
+        summary.append({'task': task, 'path': path, 'count': len(values),
+                        'p50': _percentile(values, 50), 'p95': _percentile(values, 95),
+                        'max': values[-1], 'total': sum(values)})
+    return summary
+
+
+def _format_summary(summary: List[Dict[str, Any]]) -> str:
+    headers = ['task', 'path', 'count', 'p50', 'p95', 'max', 'total']
+    rows = [[row['task'], row['path'], str(row['count'])] + [f"{row[key]:.3f}" for key in headers[3:]] for row in summary]
+    widths = [max([len(header)] + [len(row[ii]) for row in rows]) for ii, header in enumerate(headers)]
+    lines = []
+    for row in [headers] + rows:
+        cells = [cell.ljust(width) if ii < 2 else cell.rjust(width) for ii, (cell, width) in enumerate(zip(row, widths))]
+        lines.append('  '.join(cells).rstrip())
+    return '\n'.join(lines)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = ArgumentParser(
+        description=("Summarize pygw trace ledgers (of many cycles): durations (in seconds) of the spans by task and span path"),
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('ledgers', type=str, nargs='+',
+                        help=f"ledgers or directories searched for ledgers named {LEDGER_NAME} (e.g. ROTDIR/logs)")
+    parser.add_argument('-t', '--task', type=str, required=False, help="only summarize the spans of this task")
+    parser.add_argument('-d', '--depth', type=int, required=False,
+                        help="only summarize the spans nested at most this deep (1: the task phases)")
+    args = parser.parse_args(argv)
+
+    records = read_ledgers(args.ledgers)
+    if args.task:
+        records = [record for record in records if record.get('task') == args.task]
+    if args.depth:
+        records = [record for record in records if record['path'].count('/') < args.depth]
+    print(_format_summary(summarize_ledgers(records)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,23 @@
 import os
 import re
+import copy
 import json
 import yaml
+import jinja2
+import jinja2.meta
 import datetime
-from typing import Any, Dict
+from collections import namedtuple
+from typing import Any, Dict, List
 from .attrdict import AttrDict
 from .template import TemplateConstants, Template
 from .jinja import Jinja
 
 __all__ = ['YAMLFile', 'parse_yaml', 'parse_yamltmpl', 'parse_j2yaml',
-           'save_as_yaml', 'dump_as_yaml', 'vanilla_yaml']
+           'save_as_yaml', 'stream_as_yaml', 'dump_as_yaml', 'vanilla_yaml',
+           'include_cache_info', 'include_cache_clear', 'LazyInclude', 'file_stamp', 'J2YAMLCache']
+
+# Start of a jinja2 expression, statement or comment
+_JINJA_RE = re.compile(r'{{|{%|{#')
 
 
 class YAMLFile(AttrDict):
@@ -17,9 +25,11 @@ class YAMLFile(AttrDict):
     Reads a YAML file as an AttrDict and recursively converts
     nested dictionaries into AttrDict.
     This is the entry point for all YAML files.
+    If lazy is True, the files included with !INC are only loaded when they are accessed
+    (see LazyInclude).
     """
 
-    def __init__(self, path=None, data=None):
+    def __init__(self, path=None, data=None, lazy=False):
         super().__init__()
 
         if path and data:
@@ -27,9 +37,9 @@ class YAMLFile(AttrDict):
 
         config = None
         if path is not None:
-            config = parse_yaml(path=path)
+            config = parse_yaml(path=path, lazy=lazy)
         elif data is not None:
-            config = parse_yaml(data=data)
+            config = parse_yaml(data=data, lazy=lazy)
 
         if config is not None:
             self.update(config)
@@ -47,8 +57,31 @@ class YAMLFile(AttrDict):
 def save_as_yaml(data, target):
     # specifies a wide file so that long strings are on one line.
     with open(target, 'w') as fh:
-        yaml.safe_dump(vanilla_yaml(data), fh,
-                       width=100000, sort_keys=False)
+        stream_as_yaml(data, fh, width=100000)
+
+
+def stream_as_yaml(data, stream, width=None, dumper=None):
+    """
+    Write `data` to `stream` as yaml, with the same output as
+    yaml.safe_dump(vanilla_yaml(data), stream, width=width, sort_keys=False)
+    The yaml events are emitted while walking `data`, without building a plain copy of it
+    (but repeated objects are written out again rather than as yaml aliases)
+    :param data: the data to write
+    :param stream: the stream to write to
+    :param int width: the preferred width of the lines
+    :param Type[yaml.Dumper] dumper: Specify which dumper to use.
+        Defaults to yaml.CSafeDumper if pyyaml is built with libyaml, yaml.SafeDumper otherwise
+    """
+    dumper = dumper or getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    dumper = dumper(stream, default_flow_style=False, width=width, sort_keys=False)
+    try:
+        dumper.open()
+        dumper.emit(yaml.DocumentStartEvent())
+        _emit_yaml(dumper, data)
+        dumper.emit(yaml.DocumentEndEvent())
+        dumper.close()
+    finally:
+        dumper.dispose()
 
 
 def dump_as_yaml(data):
@@ -57,7 +90,7 @@ def dump_as_yaml(data):
 
 
 def parse_yaml(path=None, data=None,
-               encoding='utf-8', loader=yaml.SafeLoader):
+               encoding='utf-8', loader=None, includes: List[str] = None, lazy=False):
     """
     Load a yaml configuration file and resolve any environment variables
     The environment variables must have !ENV before them and be in this format
@@ -71,80 +104,325 @@ def parse_yaml(path=None, data=None,
         something_else: !ENV '${AWESOME_ENV_VAR}/var/${A_SECOND_AWESOME_VAR}'
     :param str path: the path to the yaml file
     :param str data: the yaml data itself as a stream
-    :param Type[yaml.loader] loader: Specify which loader to use. Defaults to yaml.SafeLoader
+    :param Type[yaml.loader] loader: Specify which loader to use.
+        Defaults to yaml.CSafeLoader if pyyaml is built with libyaml, yaml.SafeLoader otherwise
     :param str encoding: the encoding of the data if a path is specified, defaults to utf-8
+    :param list includes: if given, the paths of the files included with !INC are appended to it
+    :param bool lazy: if True, the files included with !INC are only loaded when they are accessed,
+        see LazyInclude (includes then only lists the files included directly)
     :return: the dict configuration
     :rtype: Dict[str, Any]
 
     Adopted from:
     https://dev.to/mkaranasou/python-yaml-configuration-with-environment-variables-parsing-2ha6
     """
-    # define tags
-    envtag = '!ENV'
-    inctag = '!INC'
-    # pattern for global vars: look for ${word}
-    pattern = re.compile(r'.*?\${(\w+)}.*?')
-    loader = loader or yaml.SafeLoader
-
-    # the envtag will be used to mark where to start searching for the pattern
-    # e.g. somekey: !ENV somestring${MYENVVAR}blah blah blah
-    loader.add_implicit_resolver(envtag, pattern, None)
-    loader.add_implicit_resolver(inctag, pattern, None)
-
-    def expand_env_variables(line):
-        match = pattern.findall(line)  # to find all env variables in line
-        if match:
-            full_value = line
-            for g in match:
-                full_value = full_value.replace(
-                    f'${{{g}}}', os.environ.get(g, f'${{{g}}}')
-                )
-            return full_value
-        return line
-
-    def constructor_env_variables(loader, node):
-        """
-        Extracts the environment variable from the node's value
-        :param yaml.Loader loader: the yaml loader
-        :param node: the current node in the yaml
-        :return: the parsed string that contains the value of the environment
-        variable
-        """
-        value = loader.construct_scalar(node)
-        return expand_env_variables(value)
-
-    def constructor_include_variables(loader, node):
-        """
-        Extracts the environment variable from the node's value
-        :param yaml.Loader loader: the yaml loader
-        :param node: the current node in the yaml
-        :return: the content of the file to be included
-        """
-        value = loader.construct_scalar(node)
-        value = expand_env_variables(value)
-        expanded = parse_yaml(value)
-        return expanded
-
-    loader.add_constructor(envtag, constructor_env_variables)
-    loader.add_constructor(inctag, constructor_include_variables)
-
     if path:
         with open(path, 'r', encoding=encoding) as conf_data:
-            return yaml.load(conf_data, Loader=loader)
+            return _load(conf_data, loader, includes, lazy=lazy)
     elif data:
-        return yaml.load(data, Loader=loader)
+        return _load(data, loader, includes, lazy=lazy)
     else:
         raise ValueError(
             "Either a path or data should be defined as input")
 
 
+# define tags
+_ENVTAG = '!ENV'
+_INCTAG = '!INC'
+# pattern for global vars: look for ${word}
+_ENV_PATTERN = re.compile(r'.*?\${(\w+)}.*?')
+
+# Subclasses of the loaders with the !ENV and !INC tags, see _get_loader
+_LOADERS = dict()
+
+# Files included with !INC, parsed, by real path, see _include
+_INCLUDE_CACHE = dict()
+_INCLUDE_CACHE_STATS = {'hits': 0, 'misses': 0}
+
+IncludeCacheInfo = namedtuple('IncludeCacheInfo', ['hits', 'misses', 'currsize'])
+
+
+def include_cache_info() -> IncludeCacheInfo:
+    """
+    Statistics of the cache of the files included with !INC (hits, misses, number of files cached)
+    """
+    return IncludeCacheInfo(_INCLUDE_CACHE_STATS['hits'], _INCLUDE_CACHE_STATS['misses'], len(_INCLUDE_CACHE))
+
+
+def include_cache_clear() -> None:
+    """
+    Clear the cache of the files included with !INC and its statistics
+    """
+    _INCLUDE_CACHE.clear()
+    _INCLUDE_CACHE_STATS.update(hits=0, misses=0)
+
+
+def _expand_env_variables(line, names=None):
+    match = _ENV_PATTERN.findall(line)  # to find all env variables in line
+    if names is not None:
+        names.update(match)
+    if match:
+        full_value = line
+        for g in match:
+            full_value = full_value.replace(
+                f'${{{g}}}', os.environ.get(g, f'${{{g}}}')
+            )
+        return full_value
+    return line
+
+
+def _constructor_env_variables(loader, node):
+    """
+    Extracts the environment variable from the node's value
+    :param yaml.Loader loader: the yaml loader
+    :param node: the current node in the yaml
+    :return: the parsed string that contains the value of the environment
+    variable
+    """
+    value = loader.construct_scalar(node)
+    return _expand_env_variables(value, loader.environ)
+
+
+def _constructor_include_variables(loader, node):
+    """
+    Extracts the environment variable from the node's value
+    :param yaml.Loader loader: the yaml loader
+    :param node: the current node in the yaml
+    :return: the content of the file to be included
+    """
+    value = loader.construct_scalar(node)
+    value = _expand_env_variables(value, loader.environ)
+    if loader.includes is not None:
+        loader.includes.append(value)
+    if loader.lazy:
+        return LazyInclude(value)
+    expanded = _include(value, loader)
+    return expanded
+
+
+def file_stamp(path):
+    """
+    (modification time in ns, size) of the file `path`, None if it does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _include(path, loader):
+    """
+    Parse the file `path` included by the file being loaded with `loader`.
+    Each include gets its own (deep) copy of the parsed file.
+    """
+    entry = _include_entry(path)
+
+    # The including file depends on the included files as well
+    loader.stamps.update(entry['stamps'])
+    loader.environ.update(entry['environ'])
+    if loader.includes is not None:
+        loader.includes.extend(entry['includes'])
+    return copy.deepcopy(entry['data'])
+
+
+def _include_entry(path, lazy=False):
+    """
+    The cache entry of the included file `path`, parsed (with its own includes lazy if `lazy`).
+    The parsed files are cached, and a cached file is reused as long as it and the files it includes
+    are unchanged (modification time and size), as well as the environment variables they reference.
+    """
+    if not path:
+        raise ValueError("Either a path or data should be defined as input")
+    key = os.path.realpath(path), lazy
+    entry = _INCLUDE_CACHE.get(key)
+    if entry is not None and all(file_stamp(file) == stamp for file, stamp in entry['stamps'].items()) \
+            and all(os.environ.get(name) == value for name, value in entry['environ'].items()):
+        _INCLUDE_CACHE_STATS['hits'] += 1
+    else:
+        _INCLUDE_CACHE_STATS['misses'] += 1
+        stamps = {key[0]: file_stamp(key[0])}
+        environ = set()
+        includes = []
+        with open(path, 'r', encoding='utf-8') as conf_data:
+            data = _load(conf_data, includes=includes, stamps=stamps, environ=environ, lazy=lazy)
+        entry = {'stamps': stamps,
+                 'environ': {name: os.environ.get(name) for name in environ},
+                 'includes': includes,
+                 'data': data}
+        _INCLUDE_CACHE[key] = entry
+    return entry
+
+
+class LazyInclude:
+    """
+    Proxy of a file included with !INC, that is loaded (and parsed, with its own includes lazy)
+    on first access to its content, with the environment at that time.
+    Item access, iteration, len, `in`, == and attribute access go to the content,
+    which is converted into AttrDict as in YAMLFile; `load()` returns it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._value = None
+        self._loaded = False
+
+    def load(self):
+        if not self._loaded:
+            self._value = AttrDict._hook(copy.deepcopy(_include_entry(self.path, lazy=True)['data']))
+            self._loaded = True
+        return self._value
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def __contains__(self, item):
+        return item in self.load()
+
+    def __eq__(self, other):
+        if isinstance(other, LazyInclude):
+            other = other.load()
+        return self.load() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self._value) if self._loaded else f"{type(self).__name__}({self.path!r})"
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        other = type(self)(self.path)
+        if self._loaded:
+            other._value = copy.deepcopy(self._value, memo)
+            other._loaded = True
+        return other
+
+    def __reduce__(self):
+        return type(self), (self.path,)
+
+
+def _get_loader(loader=None):
+    """
+    Return the subclass of `loader` with the !ENV and !INC tags.
+    The subclass is created once per loader, leaving `loader` itself unchanged
+    """
+    loader = loader or getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    if loader not in _LOADERS:
+        tagged = type(f'Tagged{loader.__name__}', (loader,), {})
+        # the envtag will be used to mark where to start searching for the pattern
+        # e.g. somekey: !ENV somestring${MYENVVAR}blah blah blah
+        tagged.add_implicit_resolver(_ENVTAG, _ENV_PATTERN, None)
+        tagged.add_implicit_resolver(_INCTAG, _ENV_PATTERN, None)
+        tagged.add_constructor(_ENVTAG, _constructor_env_variables)
+        tagged.add_constructor(_INCTAG, _constructor_include_variables)
+        _LOADERS[loader] = tagged
+    return _LOADERS[loader]
+
+
+def _load(stream, loader=None, includes: List[str] = None, stamps: Dict = None, environ: set = None, lazy=False):
+    """
+    yaml.load with the tagged `loader`, recording the included files in `includes`,
+    the stamps of the included files in `stamps`, and the environment variables referenced in `environ`
+    """
+    yaml_loader = _get_loader(loader)(stream)
+    yaml_loader.includes = includes
+    yaml_loader.stamps = dict() if stamps is None else stamps
+    yaml_loader.environ = set() if environ is None else environ
+    yaml_loader.lazy = lazy
+    try:
+        return yaml_loader.get_single_data()
+    finally:
+        yaml_loader.dispose()
+
+
+# yaml tags of the mappings and sequences
+_MAP_TAG = 'tag:yaml.org,2002:map'
+_SEQ_TAG = 'tag:yaml.org,2002:seq'
+
+
+def _emit_yaml(dumper, ctx):
+    """
+    Emit the yaml events of `ctx`, converted as in vanilla_yaml
+    """
+    if isinstance(ctx, LazyInclude):
+        ctx = ctx.load()
+    if isinstance(ctx, AttrDict):
+        dumper.emit(yaml.MappingStartEvent(None, _MAP_TAG, True, flow_style=False))
+        for kk, vv in ctx.items():
+            _emit_node(dumper, _represent(dumper, kk))
+            _emit_yaml(dumper, vv)
+        dumper.emit(yaml.MappingEndEvent())
+    elif isinstance(ctx, (list, tuple)):
+        dumper.emit(yaml.SequenceStartEvent(None, _SEQ_TAG, True, flow_style=False))
+        for vv in ctx:
+            _emit_yaml(dumper, vv)
+        dumper.emit(yaml.SequenceEndEvent())
+    elif isinstance(ctx, datetime.datetime):
+        _emit_node(dumper, _represent(dumper, ctx.strftime("%Y-%m-%dT%H:%M:%SZ")))
+    else:
+        _emit_node(dumper, _represent(dumper, ctx))
+
+
+def _represent(dumper, ctx):
+    """
+    The yaml node of `ctx`, from the representer of `dumper`
+    """
+    node = dumper.represent_data(ctx)
+    dumper.represented_objects = {}
+    dumper.object_keeper = []
+    dumper.alias_key = None
+    return node
+
+
+def _emit_node(dumper, node):
+    """
+    Emit the yaml events of `node`, as the serializer of `dumper` would (without aliases)
+    """
+    if isinstance(node, yaml.ScalarNode):
+        detected_tag = dumper.resolve(yaml.ScalarNode, node.value, (True, False))
+        default_tag = dumper.resolve(yaml.ScalarNode, node.value, (False, True))
+        implicit = (node.tag == detected_tag), (node.tag == default_tag)
+        dumper.emit(yaml.ScalarEvent(None, node.tag, implicit, node.value, style=node.style))
+    elif isinstance(node, yaml.SequenceNode):
+        implicit = (node.tag == dumper.resolve(yaml.SequenceNode, node.value, True))
+        dumper.emit(yaml.SequenceStartEvent(None, node.tag, implicit, flow_style=node.flow_style))
+        for item in node.value:
+            _emit_node(dumper, item)
+        dumper.emit(yaml.SequenceEndEvent())
+    elif isinstance(node, yaml.MappingNode):
+        implicit = (node.tag == dumper.resolve(yaml.MappingNode, node.value, True))
+        dumper.emit(yaml.MappingStartEvent(None, node.tag, implicit, flow_style=node.flow_style))
+        for key, value in node.value:
+            _emit_node(dumper, key)
+            _emit_node(dumper, value)
+        dumper.emit(yaml.MappingEndEvent())
+
+
 def vanilla_yaml(ctx):
     """
     Transform an input object of complex type as a plain type
     """
-    if isinstance(ctx, AttrDict):
+    if isinstance(ctx, LazyInclude):
+        return vanilla_yaml(ctx.load())
+    elif isinstance(ctx, AttrDict):
         return {kk: vanilla_yaml(vv) for kk, vv in ctx.items()}
-    elif isinstance(ctx, list):
+    elif isinstance(ctx, (list, tuple)):
         return [vanilla_yaml(vv) for vv in ctx]
     elif isinstance(ctx, datetime.datetime):
         return ctx.strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -152,7 +430,7 @@ def vanilla_yaml(ctx):
         return ctx
 
 
-def parse_j2yaml(path: str, data: Dict) -> Dict[str, Any]:
+def parse_j2yaml(path: str, data: Dict, includes: List[str] = None) -> Dict[str, Any]:
     """
     Description
     -----------
@@ -166,6 +444,8 @@ def parse_j2yaml(path: str, data: Dict) -> Dict[str, Any]:
         the path to the yaml file
     data : Dict[str, Any], optional
         the context for jinja2 templating
+    includes : List[str], optional
+        if given, the paths of the files included with !INC are appended to it
     Returns
     -------
     Dict[str, Any]
@@ -173,11 +453,16 @@ def parse_j2yaml(path: str, data: Dict) -> Dict[str, Any]:
     """
     jenv = Jinja(path, data)
     yaml_file = jenv.render
-    yaml_dict = YAMLFile(data=yaml_file)
+    includes = [] if includes is None else includes
+    first = len(includes)
+    yaml_dict = YAMLFile()
+    yaml_dict.update(parse_yaml(data=yaml_file, includes=includes))
     yaml_dict = Template.substitute_structure(
         yaml_dict, TemplateConstants.DOLLAR_PARENTHESES, data.get)
 
     # If the input yaml file included other yamls with jinja2 templates, then we need to re-parse the jinja2 templates in them
+    if not any(_has_jinja(include) for include in includes[first:]):
+        return yaml_dict
     jenv2 = Jinja(json.dumps(yaml_dict, indent=4), data)
     yaml_file2 = jenv2.render
     yaml_dict = YAMLFile(data=yaml_file2)
@@ -185,6 +470,103 @@ def parse_j2yaml(path: str, data: Dict) -> Dict[str, Any]:
     return yaml_dict
 
 
+def _has_jinja(path: str) -> bool:
+    """
+    Return True if the file at `path` contains any jinja2 syntax
+    """
+    with open(path, 'r') as fh:
+        return _JINJA_RE.search(fh.read()) is not None
+
+
+# Variables of the $( ... ) and ${ ... } (!ENV, !INC) templates of a yaml file
+_DOLLAR_PARENTHESES_RE = re.compile(r'\$\((\w+)\)')
+_DOLLAR_CURLY_BRACE_RE = re.compile(r'\${(\w+)}')
+
+
+class J2YAMLCache:
+    """
+    Renderings of jinja2-templated yaml files (see parse_j2yaml), by path.
+    A rendering is reused as long as the template and the files it depends on ({% include %},
+    {% import %} and !INC) are unchanged on disk (see file_stamp), and the values of the variables
+    they reference (in the data and, for !ENV and !INC, in the environment) are the same.
+    The dependencies are found when the template is rendered: checking a rendering only takes
+    a stat of each of them.
+    """
+
+    def __init__(self):
+        self._entries = dict()
+
+    def get(self, path: str, data: Dict) -> Any:
+        """
+        A copy of the rendering of `path` with `data`, None if there is no valid one
+        """
+        entry = self._entries.get(path)
+        if entry is None or not self._is_current(entry, data):
+            return None
+        return copy.deepcopy(entry['yaml'])
+
+    def put(self, path: str, data: Dict, yaml_dict: Any, includes: List[str]) -> None:
+        """
+        Keep (a copy of) `yaml_dict`, the rendering of `path` with `data`,
+        that included the files `includes` with !INC (see parse_j2yaml)
+        """
+        dependencies = self._dependencies(path, includes)
+        if dependencies is None:
+            self._entries.pop(path, None)
+            return
+        stamps, data_names, env_names = dependencies
+        self._entries[path] = {'stamps': stamps,
+                               'data': {name: repr(data.get(name)) for name in data_names},
+                               'environ': {name: os.environ.get(name) for name in env_names},
+                               'yaml': copy.deepcopy(yaml_dict)}
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @staticmethod
+    def _is_current(entry: Dict, data: Dict) -> bool:
+        return all(file_stamp(file) == stamp for file, stamp in entry['stamps'].items()) \
+            and all(repr(data.get(name)) == value for name, value in entry['data'].items()) \
+            and all(os.environ.get(name) == value for name, value in entry['environ'].items())
+
+    @staticmethod
+    def _dependencies(path: str, includes: List[str]):
+        """
+        The stamps of the template `path`, of the templates it includes or imports (recursively)
+        and of the files it includes with !INC (`includes`), and the names of the variables they reference,
+        in the data and in the environment.
+        None if they cannot be found (e.g. a template included by a name computed when rendering).
+        """
+        # Jinja resolves the templates included by the template and its includes relative to its directory
+        searchpath = os.path.dirname(path)
+        env = jinja2.Environment()
+        stamps = dict()
+        data_names = set()
+        env_names = set()
+        pending = [(path, True)] + [(include, False) for include in includes]
+        while pending:
+            file, templated = pending.pop()
+            if file in stamps:
+                continue
+            stamps[file] = file_stamp(file)
+            try:
+                with open(file, 'r') as fh:
+                    source = fh.read()
+                ast = env.parse(source)
+            except (OSError, jinja2.TemplateSyntaxError):
+                return None
+            data_names.update(jinja2.meta.find_undeclared_variables(ast))
+            data_names.update(_DOLLAR_PARENTHESES_RE.findall(source))
+            env_names.update(_DOLLAR_CURLY_BRACE_RE.findall(source))
+            if not templated:
+                continue
+            for name in jinja2.meta.find_referenced_templates(ast):
+                if name is None:
+                    return None
+                pending.append((os.path.join(searchpath, name), True))
+        return stamps, data_names, env_names
+
+
 def parse_yamltmpl(path: str, data: Dict = None) -> Dict[str, Any]:
     """
     Description
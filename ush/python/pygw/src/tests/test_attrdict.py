@@ -0,0 +1,91 @@
+import copy
+import pickle
+import pytest
+from pygw.attrdict import AttrDict, FrozenAttrDict, LayeredAttrDict
+
+
+def test_layered_attrdict():
+    base = AttrDict({'a': 1, 'b': 2, 'nested': {'x': 1}, 'list': [{'y': 1}]})
+    runtime = AttrDict({'b': 3, 'c': 4})
+    layered = LayeredAttrDict({'d': 5}, runtime, base)
+
+    assert layered.a == 1 and layered.b == 3 and layered['d'] == 5
+    assert list(layered) == ['a', 'b', 'nested', 'list', 'c', 'd'] and len(layered) == 6
+    assert layered == {'a': 1, 'b': 3, 'nested': {'x': 1}, 'list': [{'y': 1}], 'c': 4, 'd': 5}
+    assert isinstance(layered.nested, AttrDict)
+
+    # Writes and deletions go to the view, changes of nested values do not leak into the layers
+    layered.a = 10
+    del layered.c
+    layered.nested.x = 2
+    layered.list[0].y = 2
+    layered.update({'nested': {'z': 3}})
+    assert base == {'a': 1, 'b': 2, 'nested': {'x': 1}, 'list': [{'y': 1}]}
+    assert runtime == {'b': 3, 'c': 4}
+    assert 'c' not in layered and layered.get('c') is None
+    assert layered.nested == {'x': 2, 'z': 3} and layered.list == [{'y': 2}]
+
+    # It is a view: the values of the layers not yet read through it are those of the layers
+    base.e = 6
+    assert layered.e == 6
+
+    for other in [dict(layered), {**layered}, copy.copy(layered), copy.deepcopy(layered), pickle.loads(pickle.dumps(layered)),
+                  layered.copy()]:
+        assert other == layered
+    other = layered.copy()
+    other.nested.x = 8
+    assert layered.nested.x == 2
+    assert layered.to_dict() == {'a': 10, 'b': 3, 'nested': {'x': 2, 'z': 3}, 'list': [{'y': 2}], 'd': 5, 'e': 6}
+
+
+def test_layered_attrdict_construction():
+
+    class Base(dict):
+        # Records the values read from the base layer
+        read = []
+
+        def __getitem__(self, key):
+            self.read.append(key)
+            return super().__getitem__(key)
+
+        def items(self):
+            raise AssertionError('the base layer was copied')
+
+    base = Base({f'VAR{ii}': str(ii) for ii in range(1000)})
+    layered = LayeredAttrDict({'local': 1}, base)
+    del layered.VAR0
+    assert layered.VAR1 == '1' and layered.local == 1
+    assert Base.read == ['VAR1']
+    assert dict.__len__(layered) == 0
+
+
+def test_snapshot():
+    config = AttrDict({'a': 1, 'nested': {'x': [1, {'y': 2}]}})
+    snapshot = config.snapshot()
+
+    assert isinstance(snapshot, FrozenAttrDict)
+    assert snapshot.a == 1 and snapshot.nested.x[1].y == 2
+    assert snapshot == {'a': 1, 'nested': {'x': (1, {'y': 2})}}
+    assert hash(snapshot) == hash(config.snapshot())
+    assert {snapshot: 'cached'}[config.snapshot()] == 'cached'
+
+    # Read-only, without autovivification
+    for modify in [lambda: setattr(snapshot, 'a', 2), lambda: snapshot.nested.update({'z': 3}),
+                   lambda: snapshot.__setitem__('b', 2), lambda: snapshot.pop('a')]:
+        with pytest.raises(TypeError):
+            modify()
+    with pytest.raises(KeyError):
+        snapshot['missing']
+    assert not hasattr(snapshot, 'missing')
+
+    config.a = 2
+    assert snapshot.a == 1 and hash(snapshot) != hash(config.snapshot())
+    assert pickle.loads(pickle.dumps(snapshot)) == snapshot
+
+    # Nested values are frozen recursively and stored once
+    snapshot = FrozenAttrDict(a={1, 2}, b=[[1], {'c': {3}}])
+    assert snapshot.a == frozenset({1, 2}) and snapshot.b == ((1,), {'c': frozenset({3})})
+    assert hash(snapshot) == hash(FrozenAttrDict(a={2, 1}, b=((1,), {'c': {3}})))
+    assert 'a' not in vars(snapshot)
+    with pytest.raises(TypeError, match="the value of 'a' is an unhashable 'bytearray'"):
+        hash(FrozenAttrDict(a=bytearray(b'x')))
@@ -1,7 +1,10 @@
 import os
+import sys
+import subprocess
+import time
 from pathlib import Path
 import pytest
-from pygw.executable import Executable, which, CommandNotFoundError
+from pygw.executable import Executable, ExecutablePool, ProcessError, which, CommandNotFoundError
 
 
 script = """#!/bin/bash
@@ -58,3 +61,69 @@ def test_which(tmpdir):
         exe = which("test.x")
         assert exe is not None
         assert exe.path == path
+
+
+def test_start(tmp_path):
+    """
+    Tests `Executable.start()`
+    """
+    cmd = Executable(sys.executable)
+    process = cmd.start('-c', 'import time; time.sleep(0.2); print("done")', output=str)
+    assert process.poll() is None and process.returncode is None
+    assert process.wait() == 'done\n'
+    assert process.returncode == 0 and cmd.returncode == 0
+
+    process = cmd.start('-c', 'raise SystemExit(3)')
+    with pytest.raises(ProcessError):
+        process.wait()
+    assert process.returncode == 3
+
+    # The files opened for the output are closed even if waiting fails
+    process = cmd.start('-c', 'import time; time.sleep(10)', output=str(tmp_path / 'stdout'))
+    stream = process._streams[0]
+    with pytest.raises(subprocess.TimeoutExpired):
+        process.wait(timeout=0.1)
+    assert stream.closed
+    process.terminate()
+    process.proc.wait()
+
+
+def test_executable_pool(tmp_path):
+    """
+    Tests `ExecutablePool`
+    """
+    cmd = Executable(sys.executable)
+    pool = ExecutablePool(max_workers=4)
+    for ii in range(4):
+        pool.submit(cmd, '-c', f'import time; time.sleep(0.5); print({ii})',
+                    output=str(tmp_path / f'stdout.{ii}'), error=str(tmp_path / f'stderr.{ii}'))
+    start = time.perf_counter()
+    processes = pool.run()
+    assert time.perf_counter() - start < 1.5
+    assert [process.returncode for process in processes] == [0] * 4
+    for ii in range(4):
+        assert (tmp_path / f'stdout.{ii}').read_text() == f'{ii}\n'
+
+    # Capturing the output could block the commands (pipes are not read while they run)
+    with pytest.raises(ValueError):
+        pool.submit(cmd, '-c', 'pass', output=str)
+
+    # collect-all: every command is run
+    pool = ExecutablePool(max_workers=2, fail_fast=False)
+    for code in ['raise SystemExit(1)', 'pass', 'raise SystemExit(2)']:
+        pool.submit(cmd, '-c', code, output=os.devnull, error=os.devnull)
+    with pytest.raises(ProcessError) as excinfo:
+        pool.run()
+    assert excinfo.value.short_msg == '2 of 3 commands failed'
+
+    # fail-fast: the running commands are terminated, the others are not started
+    marker = tmp_path / 'marker'
+    pool = ExecutablePool(max_workers=2)
+    pool.submit(cmd, '-c', 'raise SystemExit(1)')
+    pool.submit(cmd, '-c', 'import time; time.sleep(10)')
+    pool.submit(cmd, '-c', f'open({str(marker)!r}, "w")')
+    start = time.perf_counter()
+    with pytest.raises(ProcessError):
+        pool.run()
+    assert time.perf_counter() - start < 5
+    assert not marker.exists()
@@ -35,3 +35,39 @@ def test_render_file(tmp_path, create_template):
     data = {"name": "Jane", "greeting": "How are you?", "current_date": current_date}
     j = Jinja(str(file_path), data, allow_missing=False)
     assert j.render == f"Hello Jane! How are you? It is: {to_isotime(current_date)}"
+
+
+def test_render_cached(tmp_path, create_template):
+
+    file_path = tmp_path / 'template.j2'
+    cache_dir = tmp_path / 'jinja_cache'
+    data = {"name": "John"}
+    j1 = Jinja(str(file_path), data, allow_missing=True, cache_dir=cache_dir)
+    j2 = Jinja(str(file_path), data, allow_missing=True, cache_dir=cache_dir)
+    assert j1.get_env(tmp_path) is j2.get_env(tmp_path)
+    assert j1.render == j2.render == "Hello John! {{ greeting }} It is: {{ current_date }}"
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # A modified template is reloaded
+    with open(file_path, 'w') as fh:
+        fh.write("Bye {{ name }}!")
+    assert Jinja(str(file_path), data, cache_dir=cache_dir).render == "Bye John!"
+
+
+def test_compile_bundle(tmp_path, create_template):
+
+    file_path = tmp_path / 'template.j2'
+    bundle = tmp_path / 'bundle.zip'
+    Jinja.compile_bundle([tmp_path], bundle)
+    assert bundle.exists()
+
+    data = {"name": "John"}
+    j = Jinja(str(file_path), data, allow_missing=True, bundle=bundle)
+    template = j.get_env(tmp_path).get_template(file_path.name)
+    assert template.filename.startswith(str(bundle))
+    assert j.render == "Hello John! {{ greeting }} It is: {{ current_date }}"
+
+    # A template modified after compilation is rendered from its source
+    with open(file_path, 'w') as fh:
+        fh.write("Bye {{ name }}!")
+    assert Jinja(str(file_path), data, bundle=bundle).render == "Bye John!"
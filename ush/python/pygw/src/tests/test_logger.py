@@ -1,5 +1,5 @@
 from pygw.logger import Logger
-from pygw.logger import logit
+from pygw.logger import logit, call_stats, call_stats_clear, call_profile_report
 
 level = 'debug'
 number_of_log_msgs = 5
@@ -43,6 +43,29 @@ def test_logger(tmp_path):
         assert reference[lev] == message
 
 
+def test_logger_queue(tmp_path):
+    """Test log file written by the listener thread"""
+
+    logfile = tmp_path / "logger.log"
+
+    log = Logger('test_logger_queue', level=level, logfile_path=logfile, use_queue=True)
+    log.debug(reference['debug'])
+    log.info(reference['info'])
+    log.warning(reference['warning'])
+    log.error(reference['error'])
+    log.critical(reference['critical'])
+    log.flush()
+
+    with open(logfile, 'r') as fh:
+        log_msgs = fh.readlines()
+
+    assert len(log_msgs) == number_of_log_msgs
+    for line in log_msgs:
+        lev = line.split('-')[3].strip().lower()
+        message = line.split(':')[-1].strip()
+        assert reference[lev] == message
+
+
 def test_logit(tmp_path):
 
     logger = Logger('test_logit', level=level, colored_log=True)
@@ -65,3 +88,26 @@ def test_logit(tmp_path):
     spam()
 
     assert True
+
+
+def test_logit_call_stats():
+
+    logger = Logger('test_logit_call_stats', level='info')
+
+    class Unrepresentable:
+        def __repr__(self):
+            raise AssertionError('arguments are represented when not logging at the DEBUG level')
+
+    @logit(logger)
+    def ignore(x):
+        return x
+
+    call_stats_clear()
+    ignore(Unrepresentable())
+    ignore(1)
+
+    stats = call_stats()[f'{__name__}.ignore']
+    assert stats.calls == 2
+    assert 0 <= stats.max <= stats.total
+    assert 0 <= stats.cpu_max <= stats.cpu_total
+    assert f'{__name__}.ignore' in call_profile_report()
@@ -0,0 +1,85 @@
+import json
+import pytest
+from datetime import datetime
+
+from pygw import metrics, tracing
+from pygw.task import Task
+from pygw.file_utils import FileHandler
+
+
+@pytest.fixture
+def metrics_dir(tmp_path):
+    previous = metrics.get_metrics_dir()
+    path = tmp_path / 'metrics'
+    metrics.enable(path)
+    metrics.reset()
+    yield path
+    metrics.reset()
+    if previous is None:
+        metrics.disable()
+    else:
+        metrics.enable(previous)
+
+
+def test_disabled():
+    previous = metrics.get_metrics_dir()
+    metrics.disable()
+    counter = metrics.counter('test_disabled_total')
+    counter.inc()
+    assert counter.samples() == []
+    assert metrics.export('test') is None
+    if previous is not None:
+        metrics.enable(previous)
+
+
+def test_metrics(metrics_dir):
+    counter = metrics.counter('test_files_total', 'Files')
+    assert metrics.counter('test_files_total') is counter
+    with pytest.raises(ValueError):
+        metrics.gauge('test_files_total')
+
+    counter.inc()
+    counter.inc(2)
+    counter.inc(task='a"b')
+    metrics.gauge('test_cache_size', 'Size').set(3)
+    histogram = metrics.histogram('test_seconds', 'Seconds', buckets=[1, 10])
+    for value in (0.5, 5, 50):
+        histogram.observe(value)
+
+    text = metrics.to_prometheus()
+    assert '# TYPE test_files_total counter\ntest_files_total 3\ntest_files_total{task="a\\"b"} 1\n' in text
+    assert 'test_cache_size 3\n' in text
+    assert ('test_seconds_bucket{le="1.0"} 1\ntest_seconds_bucket{le="10.0"} 2\ntest_seconds_bucket{le="+Inf"} 3\n'
+            'test_seconds_sum 55.5\ntest_seconds_count 3\n') in text
+
+    prom_path, json_path = metrics.export('test')
+    with open(prom_path) as fh:
+        assert fh.read() == text
+    with open(json_path) as fh:
+        exported = json.load(fh)
+    assert exported['test_files_total']['samples'] == [{'labels': {}, 'value': 3}, {'labels': {'task': 'a"b'}, 'value': 1}]
+    assert exported['test_seconds']['samples'][0]['value'] == {'buckets': [1, 1], 'sum': 55.5, 'count': 3}
+
+
+def test_instrumentation(metrics_dir, tmp_path):
+
+    src = tmp_path / 'src.txt'
+    src.write_text('0123456789')
+    FileHandler({'mkdir': [str(tmp_path / 'dest')], 'copy': [[str(src), str(tmp_path / 'dest')]]}).sync()
+
+    class MyTask(Task):
+        def execute(self):
+            pass
+
+    previous = tracing.get_ledger()
+    config = {'PDY': datetime(2023, 1, 1), 'cyc': 0, 'DATA': str(tmp_path), 'RUN': 'gdas', 'CDUMP': 'gdas',
+              'assim_freq': 6, 'ROTDIR': str(tmp_path)}
+    MyTask(config).execute()
+    tracing.set_ledger(previous)
+
+    with open(metrics_dir / 'pygw_gdas_MyTask_execute_2023010100.json') as fh:
+        exported = json.load(fh)
+    assert exported['pygw_files_copied_total']['samples'][0]['value'] == 1
+    assert exported['pygw_bytes_copied_total']['samples'][0]['value'] == 10
+    assert exported['pygw_directories_created_total']['samples'][0]['value'] == 1
+    assert exported['pygw_task_phase_seconds']['samples'][0]['labels'] == {'phase': 'execute', 'task': 'MyTask'}
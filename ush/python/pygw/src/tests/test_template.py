@@ -1,5 +1,7 @@
 import os
-from pygw.template import TemplateConstants, Template
+import copy
+import pytest
+from pygw.template import TemplateConstants, Template, TemplateCycleError
 
 
 def test_substitute_string_from_dict():
@@ -145,3 +147,90 @@ def test_substitute_with_dependencies():
               'world': 'world'}
 
     assert Template.substitute_with_dependencies(input, input, TemplateConstants.DOLLAR_PARENTHESES) == output
+
+
+def test_compile():
+    structure = {
+        'root': '$(root)',
+        'config': '$(root)/config/$(config_file)',
+        'static': {'name': 'xenon', 'list': [1, 'two']},
+        'list': [['$(root)/$(name)', 'toto'], '$($(key))'],
+        'complex': '$(dictionary)'
+    }
+    program = Template.compile(structure, TemplateConstants.DOLLAR_PARENTHESES)
+    assert program.templated
+
+    for root in ['/home/user', '/home/other']:
+        dictionary = {'root': root, 'config_file': 'config.yaml', 'name': 'xenon', 'key': 'name', 'dictionary': {'a': 1}}
+        rendered = program.render(dictionary.get)
+        assert rendered == Template.substitute_structure(copy.deepcopy(structure),
+                                                         TemplateConstants.DOLLAR_PARENTHESES, dictionary.get)
+        assert rendered['list'][1] == '$(name)'  # nested variables need another pass
+        assert rendered['static'] is structure['static']
+
+    # The compiled structure is unchanged
+    assert structure['config'] == '$(root)/config/$(config_file)'
+    assert not Template.compile(structure['static'], TemplateConstants.DOLLAR_PARENTHESES).templated
+
+
+def test_render_many():
+    template = '${ROTDIR}/${RUN}.${YMD}/${HH}/${MEMDIR}/analysis/atmos'
+    base = {'ROTDIR': '/rotdir', 'RUN': 'enkfgdas', 'YMD': '20211220', 'HH': '18'}
+    contexts = [dict(base, MEMDIR=f'mem{imem:03d}') for imem in range(1, 4)]
+    assert Template.render_many(template, TemplateConstants.DOLLAR_CURLY_BRACE, contexts) == \
+        [Template.substitute_structure(template, TemplateConstants.DOLLAR_CURLY_BRACE, context.get) for context in contexts]
+
+
+def test_substitute_styles():
+    os.environ['GREETING'] = 'Hello'
+    dictionary = {'name': 'John', 'count': 2, 'list': [1, 2]}
+    template = {'text': '${GREETING} $(name), you have $(count) @[messages]',
+                'list': '$(list)',
+                'nested': ['$(${GREETING})', '${UNKNOWN}']}
+    final = {'text': 'Hello John, you have 2 @[messages]',
+             'list': [1, 2],
+             'nested': ['$(Hello)', '${UNKNOWN}']}
+    result, unresolved = Template.substitute_styles(template,
+                                                    {TemplateConstants.DOLLAR_CURLY_BRACE: os.environ.get,
+                                                     TemplateConstants.DOLLAR_PARENTHESES: dictionary.get})
+    assert result == final
+    assert unresolved == ['$(Hello)', '${UNKNOWN}']
+
+    # A single style substitutes as substitute_structure does
+    template = 'echo $(name) $($(key)) $(count) $(unknown)'
+    dictionary = {'name': 'John', 'key': 'name', 'count': 2}
+    result, unresolved = Template.substitute_styles(template, {TemplateConstants.DOLLAR_PARENTHESES: dictionary.get})
+    assert result == Template.substitute_structure(template, TemplateConstants.DOLLAR_PARENTHESES, dictionary.get)
+    assert unresolved == ['$(name)', '$(unknown)']
+
+
+def test_substitute_with_dependencies_chain():
+    # Each variable refers to the previous one
+    input = {'v0': 'x'}
+    input.update({f'v{i}': f'$(v{i - 1})' for i in range(1, 200)})
+    output = Template.substitute_with_dependencies(input, input, TemplateConstants.DOLLAR_PARENTHESES)
+    assert output == {f'v{i}': 'x' for i in range(200)}
+
+    input = {'a': '$(b)', 'b': {'c': '$(d)'}, 'd': '$(a)'}
+    with pytest.raises(TemplateCycleError) as excinfo:
+        Template.substitute_with_dependencies(input, input, TemplateConstants.DOLLAR_PARENTHESES)
+    assert excinfo.value.cycle == ['b', 'd', 'a', 'b']
+
+
+def test_substitute_with_dependencies_containers():
+    # keys is a separate dictionary, whose (nested) containers must not be modified
+    keys = {'grid': {'res': '$(case)', 'layout': ['$(nx)', '$(ny)']}, 'case': 'C$(n)', 'n': 96,
+            'nx': 8, 'ny': '$(nx)', 'members': ['mem$(n)', {'name': '$(unknown)'}]}
+    input = {'atm': '$(grid)', 'ens': {'members': '$(members)', 'label': '$(case)_$(grid)'}}
+    keys_before, input_before = copy.deepcopy(keys), copy.deepcopy(input)
+
+    output = Template.substitute_with_dependencies(input, keys, TemplateConstants.DOLLAR_PARENTHESES)
+    assert output == {'atm': {'res': 'C96', 'layout': ['8', '8']},
+                      'ens': {'members': ['mem96', {'name': '$(unknown)'}], 'label': 'C96_$(grid)'}}
+    assert keys == keys_before
+    assert input == input_before
+
+    # The same, substituting keys by itself
+    output = Template.substitute_with_dependencies(keys, keys, TemplateConstants.DOLLAR_PARENTHESES)
+    assert output['grid'] == {'res': 'C96', 'layout': ['8', '8']} and output['members'][0] == 'mem96'
+    assert keys == keys_before
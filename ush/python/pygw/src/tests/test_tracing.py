@@ -0,0 +1,71 @@
+import pytest
+from datetime import datetime
+
+from pygw import tracing
+from pygw.task import Task
+from pygw.tracing import span, traced, current_span, read_ledgers, summarize_ledgers
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    previous = tracing.get_ledger()
+    path = tmp_path / tracing.LEDGER_NAME
+    tracing.set_ledger(path)
+    yield path
+    tracing.set_ledger(previous)
+
+
+def test_span(ledger):
+
+    @traced()
+    def stage():
+        assert current_span().path == 'task/stage'
+
+    with span('task', task='mytask', cycle='2023010100') as parent:
+        stage()
+        with span('render', path='file.yaml'):
+            pass
+    assert current_span() is None
+
+    with pytest.raises(ValueError):
+        with span('fail', task='mytask'):
+            raise ValueError('failed')
+
+    records = read_ledgers([ledger.parent])
+    assert [record['path'] for record in records] == ['task/stage', 'task/render', 'task', 'fail']
+    assert all(record['task'] == 'mytask' for record in records)
+    assert all(record['parent_id'] == parent.span_id for record in records[:2])
+    assert records[1]['attributes'] == {'path': 'file.yaml'}
+    assert records[2]['duration'] >= records[0]['duration'] + records[1]['duration']
+    assert [record['status'] for record in records] == ['ok', 'ok', 'ok', 'error']
+
+
+def test_summarize_ledgers():
+    records = [{'task': 'mytask', 'path': 'initialize', 'duration': float(duration)} for duration in range(1, 102)]
+    records.append({'task': 'mytask', 'path': 'initialize/stage', 'duration': 1.})
+    summary = summarize_ledgers(records)
+    assert summary[0] == {'task': 'mytask', 'path': 'initialize', 'count': 101,
+                          'p50': 51., 'p95': 96., 'max': 101., 'total': 5151.}
+    assert summary[1]['count'] == 1 and summary[1]['p95'] == 1.
+
+
+def test_task_phases(ledger, tmp_path):
+
+    class MyTask(Task):
+        def initialize(self):
+            super().initialize()
+            with span('stage'):
+                pass
+
+    class MySubTask(MyTask):
+        def initialize(self):
+            super().initialize()
+
+    config = {'PDY': datetime(2023, 1, 1), 'cyc': 6, 'DATA': str(tmp_path), 'RUN': 'gdas', 'CDUMP': 'gdas',
+              'assim_freq': 6, 'ROTDIR': str(tmp_path)}
+    MySubTask(config).initialize()
+
+    records = read_ledgers([ledger])
+    assert [(record['task'], record['path']) for record in records] == [('MySubTask', 'initialize/stage'),
+                                                                        ('MySubTask', 'initialize')]
+    assert records[1]['attributes'] == {'cycle': '2023010106'}
@@ -1,7 +1,11 @@
+import io
 import os
+import yaml
 import pytest
 from datetime import datetime
-from pygw.yaml_file import YAMLFile, parse_yamltmpl, parse_j2yaml, save_as_yaml, dump_as_yaml
+import pygw.yaml_file
+from pygw.yaml_file import YAMLFile, parse_yaml, parse_yamltmpl, parse_j2yaml, save_as_yaml, dump_as_yaml, _get_loader
+from pygw.yaml_file import stream_as_yaml, vanilla_yaml, include_cache_info, include_cache_clear, LazyInclude, J2YAMLCache
 
 host_yaml = """
 host:
@@ -95,3 +99,143 @@ def test_yaml_file_with_j2templates(tmp_path, create_template):
     yaml_in = YAMLFile(path=yaml_out)
 
     assert yaml_in == conf
+
+
+def test_j2yaml_with_j2includes(tmp_path):
+
+    # Jinja2 templates in included files are resolved in a second pass
+    (tmp_path / 'j2host.yaml').write_text("host:\n    user: '{{ user }}'\n    home: /home/$(user)\n")
+    (tmp_path / 'j2inc.yaml').write_text("host_file: !INC ${TMP_PATH}/j2host.yaml\nuser: '{{ user }}'\n")
+    os.environ['TMP_PATH'] = str(tmp_path)
+    data = {'user': 'me'}
+    conf = parse_j2yaml(path=str(tmp_path / 'j2inc.yaml'), data=data)
+
+    assert conf == {'host_file': {'host': {'user': 'me', 'home': '/home/me'}}, 'user': 'me'}
+
+
+def test_j2yaml_second_pass(tmp_path, monkeypatch):
+
+    # The rendered yaml is only rendered again if an included file has jinja2 templates
+    renders = []
+
+    class CountingJinja(pygw.yaml_file.Jinja):
+        @property
+        def render(self):
+            renders.append(self)
+            return super().render
+
+    monkeypatch.setattr(pygw.yaml_file, 'Jinja', CountingJinja)
+    monkeypatch.setenv('TMP_PATH', str(tmp_path))
+    (tmp_path / 'host.yaml').write_text("host:\n    home: /home/$(user)\n")
+    (tmp_path / 'j2host.yaml').write_text("host:\n    user: '{{ user }}'\n")
+    (tmp_path / 'inc.yaml').write_text("host_file: !INC ${TMP_PATH}/host.yaml\nuser: '{{ user }}'\n")
+    (tmp_path / 'j2inc.yaml').write_text("host_file: !INC ${TMP_PATH}/j2host.yaml\nuser: '{{ user }}'\n")
+    data = {'user': 'me'}
+
+    conf = parse_j2yaml(path=str(tmp_path / 'inc.yaml'), data=data)
+    assert conf == {'host_file': {'host': {'home': '/home/me'}}, 'user': 'me'}
+    assert len(renders) == 1
+
+    renders.clear()
+    conf = parse_j2yaml(path=str(tmp_path / 'j2inc.yaml'), data=data)
+    assert conf == {'host_file': {'host': {'user': 'me'}}, 'user': 'me'}
+    assert len(renders) == 2
+
+
+def test_j2yaml_cache(tmp_path):
+
+    main = tmp_path / 'main.yaml'
+    main.write_text("{% include 'inc.yaml' %}\nb: {{ b }}\n")
+    (tmp_path / 'inc.yaml').write_text("a: {{ a }}\n")
+    data = {'a': 1, 'b': 2}
+
+    def render(cache):
+        yaml_dict = cache.get(str(main), data)
+        if yaml_dict is not None:
+            return yaml_dict, True
+        includes = []
+        yaml_dict = parse_j2yaml(str(main), data, includes=includes)
+        cache.put(str(main), data, yaml_dict, includes)
+        return yaml_dict, False
+
+    cache = J2YAMLCache()
+    assert render(cache) == ({'a': 1, 'b': 2}, False)
+    yaml_dict, hit = render(cache)
+    assert hit and yaml_dict == {'a': 1, 'b': 2}
+    # the cached rendering is not changed by the caller
+    yaml_dict.a = 0
+    assert render(cache) == ({'a': 1, 'b': 2}, True)
+
+    # A change of the template, of a template it includes or of the data is a miss
+    main.write_text("{% include 'inc.yaml' %}\nb: {{ b }}0\n")
+    assert render(cache) == ({'a': 1, 'b': 20}, False)
+    assert render(cache)[1]
+    (tmp_path / 'inc.yaml').write_text("a: {{ a }}0\n")
+    assert render(cache) == ({'a': 10, 'b': 20}, False)
+    assert render(cache)[1]
+    data['a'] = 3
+    assert render(cache) == ({'a': 30, 'b': 20}, False)
+    data['c'] = 4
+    assert render(cache)[1]
+
+
+def test_parse_yaml_loader(tmp_path, create_template):
+
+    # The tags are registered once, on a subclass of the loader
+    os.environ['TMP_PATH'] = str(tmp_path)
+    resolvers = len(yaml.SafeLoader.yaml_implicit_resolvers.get(None, []))
+    conf = YAMLFile(path=str(tmp_path / 'config.yaml'))
+    for _ in range(10):
+        assert YAMLFile(path=str(tmp_path / 'config.yaml')) == conf
+        assert parse_yaml(data=conf_yaml, loader=yaml.SafeLoader) == conf
+    assert len(yaml.SafeLoader.yaml_implicit_resolvers.get(None, [])) == resolvers
+    assert len(_get_loader().yaml_implicit_resolvers[None]) == resolvers + 2
+    assert len(_get_loader(yaml.SafeLoader).yaml_implicit_resolvers[None]) == resolvers + 2
+
+
+@pytest.mark.parametrize('dumper', [None, yaml.SafeDumper])
+def test_stream_as_yaml(tmp_path, create_template, dumper):
+
+    os.environ['TMP_PATH'] = str(tmp_path)
+    data = {'user': os.environ['USER'], 'current_cycle': datetime.now()}
+    conf = parse_j2yaml(path=str(tmp_path / 'j2tmpl.yaml'), data=data)
+    conf.tmpl.cycles = [data['current_cycle'], {'1': 1.0, 'empty': [], 'text': 'multi\nline'}]
+
+    stream = io.StringIO()
+    stream_as_yaml(conf, stream, width=100000, dumper=dumper)
+    assert stream.getvalue() == yaml.safe_dump(vanilla_yaml(conf), width=100000, sort_keys=False)
+
+
+def test_include_cache(tmp_path, create_template, monkeypatch):
+
+    os.environ['TMP_PATH'] = str(tmp_path)
+    (tmp_path / 'hosts.yaml').write_text("hosts:\n- !INC ${TMP_PATH}/host.yaml\n- !INC ${TMP_PATH}/host.yaml\n")
+    include_cache_clear()
+
+    conf = YAMLFile(path=str(tmp_path / 'hosts.yaml'))
+    assert conf.hosts[0] == conf.hosts[1] == {'host': {'hostname': 'test_host', 'host_user': os.environ['USER']}}
+    assert include_cache_info() == (1, 1, 1)
+    conf.hosts[0]['host']['hostname'] = 'changed'
+    assert conf.hosts[1]['host']['hostname'] == 'test_host'
+
+    # A change of the included file or of the environment variables it references is picked up
+    with monkeypatch.context() as mp:
+        mp.setenv('USER', 'other_user')
+        assert YAMLFile(path=str(tmp_path / 'hosts.yaml')).hosts[0]['host']['host_user'] == 'other_user'
+    (tmp_path / 'host.yaml').write_text(host_yaml.replace('test_host', 'other_host'))
+    assert YAMLFile(path=str(tmp_path / 'hosts.yaml')).hosts[1]['host']['hostname'] == 'other_host'
+    assert include_cache_info().misses == 3
+
+
+def test_yaml_file_lazy(tmp_path, create_template):
+
+    os.environ['TMP_PATH'] = str(tmp_path)
+    include_cache_clear()
+    conf = YAMLFile(path=str(tmp_path / 'config.yaml'), lazy=True)
+
+    assert isinstance(conf.config.host_file, LazyInclude)
+    assert include_cache_info().misses == 0
+    assert conf.config.host_file.host.hostname == 'test_host'
+    assert include_cache_info().misses == 1
+    assert conf == YAMLFile(path=str(tmp_path / 'config.yaml'))
+    assert conf.as_dict() == YAMLFile(path=str(tmp_path / 'config.yaml')).as_dict()
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
 from hosts import Host
-from pygw.configuration import Configuration
+from pygw.configuration import Configuration, ShellScriptException, write_config_snapshot
 from abc import ABC, ABCMeta, abstractmethod
 
 __all__ = ['AppConfig']
@@ -30,6 +32,9 @@ class AppConfig(ABC, metaclass=AppConfigInit):
 
         self.scheduler = Host().scheduler
 
+        # Set by write_config_snapshots()
+        self.config_snapshot_dir = None
+
         _base = conf.parse_config('config.base')
         # Define here so the child __init__ functions can use it; will
         # be overwritten later during _init_finalize().
@@ -113,39 +118,82 @@ class AppConfig(ABC, metaclass=AppConfigInit):
         '''
         pass
 
-    def _source_configs(self, conf: Configuration) -> Dict[str, Any]:
+    def write_config_snapshots(self, conf: Configuration, snapshot_dir: str) -> None:
+        """
+        Write a snapshot of each config of the application to `snapshot_dir`/config.<name>.pkl,
+        for the python jobs to read with pygw.configuration.load_task_config instead of
+        casting their whole environment (the tasks get CONFIG_SNAPSHOT_DIR in their environment)
+        """
+        for name, config in self._source_configs(conf, cast=False).items():
+            write_config_snapshot(config, os.path.join(snapshot_dir, f'config.{name}.pkl'))
+        self.config_snapshot_dir = snapshot_dir
+
+    def _source_configs(self, conf: Configuration, cast: bool = True) -> Dict[str, Any]:
         """
         Given the configuration object and jobs,
         source the configurations for each config and return a dictionary
         Every config depends on "config.base"
-        """
+        If `cast` is False, the values are returned as str
 
-        configs = dict()
-
-        # Return config.base as well
-        configs['base'] = conf.parse_config('config.base')
+        The configs are sourced in batches that source config.base only once.
+        If the environment variable GW_CONFIG_WORKERS is greater than 1,
+        the configs are split into that many batches that are sourced concurrently.
+        """
 
         # Source the list of all config_files involved in the application
+        # All must source config.base first; it is sourced once per batch
+        names = ['base'] + self.configs_names
+        batch = [[]]  # Return config.base as well
         for config in self.configs_names:
 
-            # All must source config.base first
-            files = ['config.base']
-
             if config in ['eobs', 'eomg']:
-                files += ['config.anal', 'config.eobs']
+                files = ['config.anal', 'config.eobs']
             elif config in ['eupd']:
-                files += ['config.anal', 'config.eupd']
+                files = ['config.anal', 'config.eupd']
             elif config in ['efcs']:
-                files += ['config.fcst', 'config.efcs']
+                files = ['config.fcst', 'config.efcs']
             elif 'wave' in config:
-                files += ['config.wave', f'config.{config}']
+                files = ['config.wave', f'config.{config}']
             else:
-                files += [f'config.{config}']
+                files = [f'config.{config}']
 
             print(f'sourcing config.{config}')
-            configs[config] = conf.parse_config(files)
-
-        return configs
+            batch.append(files)
+
+        workers = max(1, min(int(os.environ.get('GW_CONFIG_WORKERS', 1)), len(batch)))
+        size = -(-len(batch) // workers)
+        chunks = [range(ii, min(ii + size, len(batch))) for ii in range(0, len(batch), size)]
+
+        parsed = [None] * len(batch)
+        errors = dict()
+
+        def _source_chunk(chunk: range) -> None:
+            try:
+                parsed[chunk.start:chunk.stop] = conf.parse_configs_batch([batch[ii] for ii in chunk],
+                                                                          common='config.base', cast=cast)
+            except ShellScriptException:
+                # Source the configs of this batch one by one to find out which ones failed
+                for ii in chunk:
+                    try:
+                        parsed[ii] = conf.parse_config(['config.base'] + batch[ii], cast=cast)
+                    except ShellScriptException as exc:
+                        errors[names[ii]] = exc
+
+        if workers == 1:
+            _source_chunk(chunks[0])
+        else:
+            # Threads suffice: the configs are sourced in shell subprocesses
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(_source_chunk, chunks))
+
+        if errors:
+            failed = [name for name in names if name in errors]
+            for name in failed:
+                print(f'ERROR sourcing config.{name}: {errors[name]}')
+            raise ShellScriptException([file for name in failed for file in batch[names.index(name)]],
+                                       f'Failed to source {len(failed)} config(s): {", ".join(failed)}')
+
+        return dict(zip(names, parsed))
 
     @abstractmethod
     def get_task_names(self) -> Dict[str, List[str]]:
@@ -46,6 +46,8 @@ class Tasks:
                       'cyc': '<cyclestr>@H</cyclestr>',
                       'COMROOT': self._base.get('COMROOT'),
                       'DATAROOT': self._base.get('DATAROOT')}
+        if self.app_config.config_snapshot_dir is not None:
+            envar_dict['CONFIG_SNAPSHOT_DIR'] = self.app_config.config_snapshot_dir
         self.envars = self._set_envars(envar_dict)
 
     @staticmethod
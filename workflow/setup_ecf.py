@@ -24,7 +24,7 @@
 
 import os
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from configuration import Configuration
+from configuration import Configuration, write_config_snapshot
 from ecFlow.ecflow_setup import Ecflowsetup
 
 
@@ -46,6 +46,8 @@ def input_args():
     parser.add_argument('--savedir', type=str,
                         default=os.environ['PWD'], required=False,
                         help='Location to save the definition files')
+    parser.add_argument('--config-snapshots', action='store_true', required=False,
+                        help='write a snapshot of config.base to EXPDIR/config_snapshots')
     arguments = parser.parse_args()
 
     return arguments
@@ -68,6 +70,14 @@ if __name__ == "__main__":
     envconfigs = dict()
     envconfigs['base'] = cfg.parse_config('config.base')
 
+    if args.config_snapshots:
+        snapshot_dir = os.path.join(args.expdir, 'config_snapshots')
+        write_config_snapshot(cfg.parse_config('config.base', cast=False),
+                              os.path.join(snapshot_dir, 'config.base.pkl'))
+        envconfigs['base']['CONFIG_SNAPSHOT_DIR'] = snapshot_dir
+
     workflow = Ecflowsetup(args, envconfigs)
+    if args.config_snapshots:
+        workflow.environment_edits.append('CONFIG_SNAPSHOT_DIR')
     workflow.generate_workflow()
     workflow.save()
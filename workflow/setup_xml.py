@@ -36,6 +36,8 @@ def input_args():
                         default=25, required=False)
     parser.add_argument('--verbosity', help='verbosity level of Rocoto', type=int,
                         default=10, required=False)
+    parser.add_argument('--config-snapshots', help='write a snapshot of the config of each job to EXPDIR/config_snapshots',
+                        action='store_true', required=False)
 
     args = parser.parse_args()
 
@@ -71,6 +73,9 @@ if __name__ == '__main__':
     # Configure the application
     app_config = app_config_factory.create(f'{net}_{mode}', cfg)
 
+    if user_inputs.config_snapshots:
+        app_config.write_config_snapshots(cfg, os.path.join(base['EXPDIR'], 'config_snapshots'))
+
     # Create Rocoto Tasks and Assemble them into an XML
     xml = rocoto_xml_factory.create(f'{net}_{mode}', app_config, rocoto_param_dict)
     xml.write()
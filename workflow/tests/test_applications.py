@@ -0,0 +1,65 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pygw.configuration import Configuration, ShellScriptException  # noqa: E402
+from applications.applications import AppConfig  # noqa: E402
+
+
+def _write_configs(config_dir, configs):
+    for name, body in configs.items():
+        with open(config_dir / f'config.{name}', 'w') as fh:
+            fh.write(body)
+
+
+def _source_configs(names, conf):
+    # _source_configs only needs the config names of the application;
+    # AppConfig itself cannot be instantiated off a supported host
+    return AppConfig._source_configs(SimpleNamespace(configs_names=names), conf)
+
+
+def test_source_configs_workers(tmp_path, monkeypatch):
+    _write_configs(tmp_path, {
+        'base': 'export HOMEgfs=/home/gfs\nexport assim_freq=6\n',
+        'anal': 'export DO_ANAL=YES\n',
+        'eobs': 'export NMEM_EOMGGRP=10\n',
+        'fcst': 'export FHMAX=${assim_freq}\n',
+        'post': 'export POST_TASKS=4\n',
+    })
+    names = ['eobs', 'fcst', 'post']
+    conf = Configuration(str(tmp_path))
+
+    monkeypatch.setenv('GW_CONFIG_WORKERS', '1')
+    serial = _source_configs(names, conf)
+    monkeypatch.setenv('GW_CONFIG_WORKERS', '3')
+    concurrent = _source_configs(names, conf)
+
+    assert list(concurrent) == ['base'] + names
+    assert concurrent == serial
+    assert concurrent['eobs'].DO_ANAL is True
+    assert concurrent['eobs'].NMEM_EOMGGRP == 10
+    assert concurrent['fcst'].FHMAX == 6
+    assert 'POST_TASKS' not in concurrent['fcst']
+
+
+def test_source_configs_error(tmp_path, monkeypatch, capsys):
+    _write_configs(tmp_path, {
+        'base': 'export HOMEgfs=/home/gfs\n',
+        'fcst': 'export FHMAX=120\n',
+        'post': 'echo "post is broken"\nexit 1\n',
+        'arch': 'export ARCH_CYC=0\n',
+    })
+    conf = Configuration(str(tmp_path))
+    monkeypatch.setenv('GW_CONFIG_WORKERS', '2')
+
+    with pytest.raises(ShellScriptException, match=r'Failed to source 1 config\(s\): post:'):
+        _source_configs(['fcst', 'post', 'arch'], conf)
+
+    out = capsys.readouterr().out
+    assert 'ERROR sourcing config.post' in out
+    assert 'ERROR sourcing config.fcst' not in out
+    assert 'ERROR sourcing config.arch' not in out